@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+
+from floorball_penalty_timekeeping.results import as_penalty_table
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.session import PLACEHOLDER_TEAM
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+PENALTY_COLUMNS = [
+    "match", "team", "player", "event_id", "to_bench", "time_start", "time_end", "match_end", "personal", "duration",
+]
+PENALTY_DTYPES = [object, object, object, np.int32, np.int32, float, float, np.int64, bool, float]
+STRENGTH_COLUMNS = ["match", "team", "power_play", "short_handed", "seconds_at_cap", "cap_hits"]
+
+
+def _known_times(tables):
+    times = [
+        getattr(table, column)[~table.is_missing(column)]
+        for table in tables.values()
+        for column in ["to_bench", "time_start", "time_end"]
+    ]
+    times = np.concatenate(times) if times else np.empty(0)
+    return int(times.max()) if len(times) else 0
+
+
+def _bench_times(table, match_end):
+    """Times of the bench penalties, open ends are closed at the end of the match."""
+    bench = ~table.personal
+    started = ~table.is_missing("time_start")[bench]
+    to_bench = table.to_bench[bench].astype(np.int64)
+    starts = np.minimum(table.time_start[bench], match_end).astype(np.int64)
+    ends = np.minimum(np.where(table.is_missing("time_end")[bench], match_end, table.time_end[bench]), match_end).astype(np.int64)
+    return to_bench, started, starts, ends
+
+
+def _running_at(starts, ends, times):
+    """Number of intervals running at ``times``, intervals starting at a time count from it."""
+    return (
+        np.searchsorted(np.sort(starts), times, side="right")
+        - np.searchsorted(np.sort(ends), times, side="right")
+    )
+
+
+def strength_records(name, tables, match_end, max_running=DEFAULT_RULES.max_running):
+    """Power play, short handed and capped seconds of both teams of a match."""
+    teams = list(tables)
+    bench_times = [_bench_times(tables[team], match_end) for team in teams]
+    intervals = [(starts[started], ends[started]) for _, started, starts, ends in bench_times]
+
+    times = np.unique(np.concatenate([[0, match_end]] + [np.concatenate(interval) for interval in intervals]))
+    durations = np.diff(times)
+    running = np.array([_running_at(starts, ends, times[:-1]) for starts, ends in intervals]).reshape(len(teams), -1)
+
+    records = []
+    for k, team in enumerate(teams):
+        others = np.delete(running, k, axis=0)
+        opponent = others.max(axis=0) if len(others) else np.zeros_like(running[k])
+
+        # penalties going to the bench while the maximum number is running,
+        # a penalty starting right away is not running before itself
+        to_bench, started, starts, ends = bench_times[k]
+        already_running = _running_at(*intervals[k], to_bench) - (
+            started & (starts == to_bench) & (ends > to_bench)
+        )
+        records.append([
+            name,
+            team,
+            int(durations[opponent > running[k]].sum()),
+            int(durations[opponent < running[k]].sum()),
+            int(durations[running[k] >= max_running].sum()),
+            int((already_running >= max_running).sum()),
+        ])
+    return records
+
+
+class PenaltyAnalytics:
+    """Season-wide aggregates over the penalty tables of many matches.
+
+    Every match is added once with its penalty tables, queries only work on
+    the stored columns and never run the timekeeping again. Penalties still
+    open at the end of a match count until ``match_end``, which defaults to
+    the latest known time of the match. The full length of the bench
+    penalties is taken from ``rules`` and the event codes of the match.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.matches = []
+        # preallocated columns of all penalty rows, grown by doubling
+        self._columns = {column: np.empty(0, dtype=dtype) for column, dtype in zip(PENALTY_COLUMNS, PENALTY_DTYPES)}
+        self._size = 0
+        self._strength = []
+        self._penalties = None
+
+    def __len__(self):
+        return len(self.matches)
+
+    @classmethod
+    def from_archive(cls, archive, rules=None):
+        analytics = cls(rules)
+        for name in archive.names:
+            arrays = archive.event_arrays(name)
+            end = arrays["seconds"]
+            analytics.add(name, archive.penalty_tables(name), int(end.max()) if len(end) else None, arrays["event"])
+        return analytics
+
+    def add_events(self, name, events, engine="python"):
+        ordered_events = prepare_events(events)
+        tables = timekeeping(ordered_events, engine=engine, as_tables=True, rules=self.rules)
+        event_codes = np.zeros(int(ordered_events["index"].max()) + 1, dtype=np.int64)
+        event_codes[ordered_events["index"].to_numpy()] = ordered_events["event"].to_numpy()
+        self.add(name, tables, int(ordered_events["seconds"].max()), event_codes)
+
+    def _durations(self, table, event_codes):
+        """Full length of the bench penalties, NaN for personal penalties and unknown codes."""
+        rules = self.rules.compiled
+        bench = ~table.personal
+        durations = np.full(len(table), np.nan)
+        if event_codes is not None:
+            codes = np.asarray(event_codes, dtype=np.int64)[table.event_id[bench]]
+            durations[bench] = np.take(rules.bench_durations, codes)
+        else:
+            # without event codes only a rule set with one length of bench penalties is known
+            lengths = {rules.bench_durations[event] for event in rules.penalty_events}
+            if len(lengths) == 1:
+                durations[bench] = lengths.pop()
+        return durations
+
+    def add(self, name, penalty_tables, match_end=None, event_codes=None):
+        """Add the penalty tables of a match.
+
+        ``event_codes`` are the codes of the events by ``event_id``, they
+        give the full length of every bench penalty.
+        """
+        tables = {
+            team: as_penalty_table(table)
+            for team, table in penalty_tables.items()
+            if team != PLACEHOLDER_TEAM
+        }
+        if match_end is None:
+            match_end = _known_times(tables)
+        match_end = max(match_end, _known_times(tables))
+
+        for team, table in tables.items():
+            self._append({
+                "match": name,
+                "team": team,
+                "player": table.player,
+                "event_id": table.event_id,
+                "to_bench": table.to_bench,
+                "time_start": np.where(table.is_missing("time_start"), np.nan, table.time_start),
+                "time_end": np.where(table.is_missing("time_end"), np.nan, table.time_end),
+                "match_end": match_end,
+                "personal": table.personal,
+                "duration": self._durations(table, event_codes),
+            }, len(table))
+        self._strength += strength_records(name, tables, match_end, self.rules.max_running)
+        self.matches.append(name)
+        self._penalties = None
+
+    def _append(self, values, rows):
+        end = self._size + rows
+        capacity = len(self._columns["match"])
+        if end > capacity:
+            capacity = max(end, 2 * capacity, 64)
+            for column, array in self._columns.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self._size] = array[:self._size]
+                self._columns[column] = grown
+        for column, value in values.items():
+            self._columns[column][self._size:end] = value
+        self._size = end
+
+    def penalties(self):
+        """All penalty rows of all matches, missing times are NaN."""
+        if self._penalties is None:
+            self._penalties = pd.DataFrame({column: array[:self._size] for column, array in self._columns.items()})
+        return self._penalties
+
+    def strength(self):
+        return pd.DataFrame(self._strength, columns=STRENGTH_COLUMNS)
+
+    def power_play_seconds(self):
+        return self.strength().groupby("team", sort=False)[["power_play", "short_handed"]].sum()
+
+    def cap_hits(self):
+        """How often and how long a team had the maximum number of running penalties."""
+        return self.strength().groupby("team", sort=False)[["cap_hits", "seconds_at_cap"]].sum()
+
+    def penalty_kill(self):
+        """Bench penalties that ran their full time or were ended by a goal."""
+        penalties = self.penalties()
+        bench = penalties.loc[~penalties["personal"] & penalties["time_end"].notna() & penalties["duration"].notna()]
+        served = bench["time_end"] - bench["time_start"]
+        result = pd.DataFrame({
+            "team": bench["team"],
+            "killed": served >= bench["duration"],
+            "terminated_by_goal": served < bench["duration"],
+        }).groupby("team", sort=False).sum()
+        result["success_rate"] = result["killed"] / (result["killed"] + result["terminated_by_goal"])
+        return result
+
+    def bench_seconds(self):
+        """Seconds every player spent on the bench, replacements ("Bgl.") excluded.
+
+        Overlapping penalties of a player, like both parts of a major
+        penalty, are merged and count once.
+        """
+        penalties = self.penalties()
+        players = penalties.loc[~penalties["player"].astype(str).str.startswith("Bgl.")]
+        key = players.groupby(["match", "team", "player"], sort=False).ngroup().to_numpy()
+        begin = players["to_bench"].to_numpy(dtype=float)
+        end = players["time_end"].fillna(players["match_end"]).to_numpy(dtype=float)
+
+        # within a player sorted by begin, every penalty adds the time after
+        # the latest end of the penalties before it
+        order = np.lexsort((begin, key))
+        key, begin, end = key[order], begin[order], end[order]
+        latest_end = pd.Series(end).groupby(key).cummax().to_numpy()
+        previous_end = np.concatenate([[-np.inf], latest_end[:-1]])
+        previous_end[np.concatenate([[True], key[1:] != key[:-1]])] = -np.inf
+        added = np.empty(len(order))
+        added[order] = np.maximum(latest_end - np.maximum(begin, previous_end), 0)
+
+        seconds = pd.Series(added, index=players.index, name="seconds")
+        return seconds.groupby([players["team"], players["player"]], sort=False).sum()
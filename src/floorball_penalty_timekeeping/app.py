@@ -1,51 +1,89 @@
-import pandas as pd
+import os
+
 import streamlit as st
 
-from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.cache import default_cache
+from floorball_penalty_timekeeping.session import TimekeepingSession
 from floorball_penalty_timekeeping.utils import Event
-from floorball_penalty_timekeeping.utils import prepare_events
+from floorball_penalty_timekeeping.validation import ERROR
+from floorball_penalty_timekeeping.validation import validate_event_arrays
 from floorball_penalty_timekeeping.views import create_input_form
 from floorball_penalty_timekeeping.views import create_result_layout
+from floorball_penalty_timekeeping.wal import DurableSession
+
+DEFAULT_MATCH = "match"
+
+
+@st.cache_resource
+def durable_session(directory, name):
+    # one writer per match log, shared by all browser sessions of the process
+    return DurableSession(directory, name)
+
+
+def create_session():
+    """Session of the match, logged to TIMEKEEPING_LOG_DIR if it is set.
+
+    The match is selected with the ``match`` query parameter.
+    """
+    directory = os.environ.get("TIMEKEEPING_LOG_DIR")
+    if directory is None:
+        return TimekeepingSession()
+    return durable_session(directory, st.query_params.get("match", DEFAULT_MATCH))
 
 
 def add_new_event(dataobj):
-    st.session_state.events.append(
+    st.session_state.session.append(
         dataobj.__dict__
     )
 
 
 def delete_last_event():
-    st.session_state.events.pop()
+    st.session_state.session.pop_last()
     st.rerun()
 
 
 def layout():
 
-    if "events" not in st.session_state:
-        st.session_state.events = []
+    if "session" not in st.session_state:
+        st.session_state.session = create_session()
 
-    events = st.session_state.events
+    session = st.session_state.session
 
     st.write("# Streamlit app for floorball penalty timeline plots")
 
     st.write(
         """Enter penalty-relevant events in the form below and create a
         timeline of the penalties. The idea was born at a weekend referee
-        seminar and currenlty is a quick-and-dirty implementation. Your inputs
-        are not validated for consistency, so entering impossible events to the
-        table will results in wrong results."""
+        seminar and currenlty is a quick-and-dirty implementation. Impossible
+        events, e.g. penalties for a player after a match penalty, are reported
+        below the form and no timeline is created until they are corrected."""
     )
     st.write("Make the app better by contributing [@github](https://github.com/fwitte/floorball-penalty-timekeeping).")
 
-    create_input_form(Event, add_new_event)
+    create_input_form(Event, add_new_event, session.rules)
+
+    cache = default_cache()
+    with session.lock:
+        # read a consistent state of a session shared with other browser sessions
+        if len(session) == 0:
+            return
+        preprocessed_events = session.prepared_events()
+        diagnostics = validate_event_arrays(preprocessed_events, session.rules)
+        key = session.content_key()
+        penalty_times_by_teams = None
+        if not any(diagnostic.severity == ERROR for diagnostic in diagnostics):
+            penalty_times_by_teams = cache.get_or_compute(f"{key}:tables", session.penalty_tables)
 
-    if len(events) > 0:
-        events = pd.DataFrame(events).astype({"team": str, "player": str})
-        preprocessed_events = prepare_events(pd.DataFrame(events))
-        penalty_times_by_teams = timekeeping(preprocessed_events.copy())
-        goals = preprocessed_events.loc[preprocessed_events["event"] == 0].copy()
-        teams = list(penalty_times_by_teams.keys())
-        create_result_layout(preprocessed_events, penalty_times_by_teams, goals, teams)
+    for diagnostic in diagnostics:
+        report = st.error if diagnostic.severity == ERROR else st.warning
+        report(diagnostic.message)
+
+    # the events can still be removed if they are inconsistent
+    goals = preprocessed_events.loc[preprocessed_events["event"].isin(session.rules.compiled.terminating_events)].copy()
+    teams = list(penalty_times_by_teams or [])
+    create_result_layout(
+        preprocessed_events, penalty_times_by_teams, goals, teams, cache=cache, key=key, rules=session.rules
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+import pandas as pd
+
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+
+@dataclass
+class MatchResult:
+    name: str
+    penalty_times_by_team: dict | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def timekeeping_match(name, events, engine="python"):
+    try:
+        events = prepare_events(pd.DataFrame(events))
+        return MatchResult(name, timekeeping(events, engine=engine))
+    except Exception as e:
+        return MatchResult(name, error=f"{type(e).__name__}: {e}")
+
+
+def _timekeeping_match(item, engine):
+    return timekeeping_match(*item, engine=engine)
+
+
+def timekeeping_many(matches, workers=None, engine="python", prefetch=4):
+    """Compute the penalty times of many matches on a process pool.
+
+    ``matches`` is a mapping or an iterable of ``(name, events)`` pairs. The
+    results are yielded as :class:`MatchResult` in input order, a failing
+    match is reported through ``MatchResult.error`` and does not stop the
+    batch. With ``workers=1`` everything runs in the calling process.
+    """
+    if isinstance(matches, dict):
+        matches = matches.items()
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for name, events in matches:
+            yield timekeeping_match(name, events, engine=engine)
+        return
+
+    function = partial(_timekeeping_match, engine=engine)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # keep a bounded number of matches in flight to stream large seasons
+        pending = deque()
+        for item in matches:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= workers * prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,127 @@
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import datetime
+from datetime import timezone
+
+import numpy as np
+import pandas as pd
+
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.rules import MATCH_DURATION
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+DEFAULT_PENALTY_MIX = {2: 0.7, 4: 0.1, 3: 0.15, 5: 0.05}
+
+
+def generate_match(num_events, penalty_share=0.6, penalty_mix=None, num_players=20, seed=None):
+    """Create a synthetic match in the input layout of the app.
+
+    A share of ``penalty_share`` of the events are penalties drawn from
+    ``penalty_mix`` (event code to weight), the remaining events are goals.
+    """
+    penalty_mix = penalty_mix or DEFAULT_PENALTY_MIX
+    for event in penalty_mix:
+        if event not in DEFAULT_RULES.events:
+            raise ValueError(f"Unknown event code {event}.")
+
+    rng = random.Random(seed)
+    seconds = sorted(rng.randrange(MATCH_DURATION) for _ in range(num_events))
+    penalties = list(penalty_mix)
+    weights = list(penalty_mix.values())
+
+    events = []
+    for second in seconds:
+        if rng.random() < penalty_share:
+            event = rng.choices(penalties, weights)[0]
+        else:
+            event = 0
+        events.append({
+            "team": rng.choice(["A", "B"]),
+            "player": str(rng.randint(1, num_players)),
+            "event": event,
+            "minutes": second // 60,
+            "seconds": second % 60,
+        })
+    return events
+
+
+def _measure(function, make_arguments, repeat):
+    timings = []
+    for _ in range(repeat):
+        arguments = make_arguments()
+        start = time.perf_counter()
+        function(*arguments)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _summary(name, num_events, timings):
+    return {
+        "benchmark": name,
+        "num_events": num_events,
+        "repeat": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+
+
+def run_benchmarks(sizes=(20, 60, 120), penalty_share=0.6, penalty_mix=None, engines=("python",), repeat=5, plot=True, seed=0):
+    """Time prepare_events, timekeeping and the plot preparation separately."""
+    if plot:
+        from floorball_penalty_timekeeping.views import _prepare_penalty_times_for_plot
+
+    results = []
+    for num_events in sizes:
+        events = pd.DataFrame(generate_match(num_events, penalty_share, penalty_mix, seed=seed))
+        prepared = prepare_events(events.copy())
+
+        timings = _measure(prepare_events, lambda: (events.copy(),), repeat)
+        results.append(_summary("prepare_events", num_events, timings))
+
+        for engine in engines:
+            timings = _measure(lambda e: timekeeping(e, engine=engine), lambda: (prepared.copy(),), repeat)
+            results.append(_summary(f"timekeeping[{engine}]", num_events, timings))
+
+        if plot:
+            penalties = timekeeping(prepared.copy())
+            teams = list(penalties)
+            timings = _measure(_prepare_penalty_times_for_plot, lambda: (penalties, teams), repeat)
+            results.append(_summary("prepare_penalty_times_for_plot", num_events, timings))
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "penalty_share": penalty_share,
+            "penalty_mix": {str(event): weight for event, weight in (penalty_mix or DEFAULT_PENALTY_MIX).items()},
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare_benchmarks(results, baseline, tolerance=0.2):
+    """Return the benchmarks whose median got slower than ``1 + tolerance`` times the baseline."""
+    reference = {
+        (result["benchmark"], result["num_events"]): result["median"]
+        for result in baseline["results"]
+    }
+    regressions = []
+    for result in results["results"]:
+        key = (result["benchmark"], result["num_events"])
+        if key in reference and result["median"] > reference[key] * (1 + tolerance):
+            regressions.append({**result, "baseline": reference[key], "ratio": result["median"] / reference[key]})
+    return regressions
+
+
+def write_benchmarks(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+
+EVENT_COLUMNS = ["index", "team", "player", "event", "seconds"]
+_MISSING = object()
+
+
+def events_key(ordered_events, **options):
+    """Canonical content hash of prepared events and computation options."""
+    content = {
+        "events": {column: ordered_events[column].tolist() for column in EVENT_COLUMNS},
+        "options": options,
+    }
+    serialized = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+class TimelineCache:
+    """LRU cache of timekeeping results with an optional shared directory.
+
+    Entries are kept in memory up to ``maxsize`` and, if ``directory`` is
+    given, pickled to it, so that other processes and browser sessions
+    serving the same match find them. The directory keeps up to
+    ``max_files`` entries, the least recently used files are removed first.
+    Only point ``directory`` to a location that is not writable by untrusted
+    users. Cached values are shared and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize=256, directory=None, max_files=1024):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.directory is not None:
+            try:
+                with open(self._path(key), "rb") as f:
+                    value = pickle.load(f)
+                # the modification time orders the files for eviction
+                os.utime(self._path(key))
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                self._remember(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory is not None:
+            # write to a temporary file first, readers never see partial entries
+            fd, path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path, self._path(key))
+            self._evict_files()
+
+    def _evict_files(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                try:
+                    files.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        if len(files) <= self.max_files:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # removed by another process sharing the directory
+                pass
+
+    def get_or_compute(self, key, function):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = function()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Process-wide cache, configured by TIMEKEEPING_CACHE_SIZE, TIMEKEEPING_CACHE_DIR and TIMEKEEPING_CACHE_FILES."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TimelineCache(
+            maxsize=int(os.environ.get("TIMEKEEPING_CACHE_SIZE", 256)),
+            directory=os.environ.get("TIMEKEEPING_CACHE_DIR"),
+            max_files=int(os.environ.get("TIMEKEEPING_CACHE_FILES", 1024)),
+        )
+    return _default_cache
+
+
+def cached_timekeeping(ordered_events, cache=None, **kwargs):
+    """Memoized :func:`timekeeping` keyed by the content of the prepared events."""
+    if cache is None:
+        cache = default_cache()
+    key = events_key(ordered_events, function="timekeeping", **kwargs)
+    return cache.get_or_compute(key, lambda: timekeeping(ordered_events, **kwargs))
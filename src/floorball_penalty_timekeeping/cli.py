@@ -1,12 +1,179 @@
+import json
 import os
 import subprocess
 
 import click
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option('--debug', default=False, help='Run app in debug mode.')
-def program_run(debug):
+@click.pass_context
+def program_run(ctx, debug):
     """Start the GUI"""
-    path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'app.py'))
-    subprocess.run(["streamlit", "run", path])
+    if ctx.invoked_subcommand is None:
+        path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'app.py'))
+        subprocess.run(["streamlit", "run", path])
+
+
+@program_run.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', default=None, type=int, help='Number of worker processes, defaults to the number of CPUs.')
+@click.option('--engine', default='python', type=click.Choice(['python', 'pandas']), help='Timekeeping engine.')
+@click.option('--output', default='-', type=click.File('w'), help='JSON lines output file, defaults to stdout.')
+def batch(path, workers, engine, output):
+    """Compute the penalty times of all matches in a JSON or JSON lines file"""
+    from floorball_penalty_timekeeping.batch import timekeeping_many
+    from floorball_penalty_timekeeping.io import matches_from_json
+
+    num_errors = 0
+    for result in timekeeping_many(matches_from_json(path), workers=workers, engine=engine):
+        record = {"match": result.name, "error": result.error, "penalties": None}
+        if result.ok:
+            record["penalties"] = {
+                team: json.loads(penalty_times.to_json(orient="records"))
+                for team, penalty_times in result.penalty_times_by_team.items()
+            }
+        else:
+            num_errors += 1
+        output.write(json.dumps(record) + "\n")
+
+    if num_errors > 0:
+        click.echo(f"{num_errors} match(es) failed.", err=True)
+
+
+@program_run.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--match', 'name', required=True, help='Name of the match in the file.')
+@click.option('--format', 'output_format', default='json', type=click.Choice(['csv', 'json']), help='Output format.')
+@click.option('--engine', default='python', type=click.Choice(['python', 'pandas']), help='Timekeeping engine.')
+@click.option('--output', default='-', type=click.File('w'), help='Output file, defaults to stdout.')
+def compute(path, name, output_format, engine, output):
+    """Compute the penalty times of one match without the GUI"""
+    # keep the imports of this command free of streamlit and matplotlib
+    from floorball_penalty_timekeeping.io import events_from_json
+    from floorball_penalty_timekeeping.io import events_from_jsonl
+    from floorball_penalty_timekeeping.io import is_jsonl
+    from floorball_penalty_timekeeping.timekeeping import timekeeping
+    from floorball_penalty_timekeeping.utils import prepare_events
+
+    read_events = events_from_jsonl if is_jsonl(path) else events_from_json
+    try:
+        events = read_events(path, name)
+    except KeyError:
+        raise click.BadParameter(f"No match {name!r} in {path}.", param_hint="--match")
+
+    _write_penalties(timekeeping(prepare_events(events), engine=engine), output_format, output)
+
+
+@program_run.command()
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--match', 'name', required=True, help='Name of the match in the log directory.')
+@click.option('--format', 'output_format', default='json', type=click.Choice(['csv', 'json']), help='Output format.')
+@click.option('--output', default='-', type=click.File('w'), help='Output file, defaults to stdout.')
+@click.option('--snapshot', is_flag=True, help='Store a snapshot of the recovered match and truncate its log.')
+def recover(directory, name, output_format, output, snapshot):
+    """Compute the penalty times of a match from its event log"""
+    from floorball_penalty_timekeeping.wal import DurableSession
+    from floorball_penalty_timekeeping.wal import EventLog
+
+    if name not in EventLog.names(directory):
+        raise click.BadParameter(f"No log of match {name!r} in {directory}.", param_hint="--match")
+
+    session = DurableSession(directory, name)
+    if snapshot:
+        session.snapshot()
+    session.close()
+    _write_penalties(session.penalty_times_by_team(), output_format, output)
+
+
+def _write_penalties(penalty_times_by_team, output_format, output):
+    if output_format == "csv":
+        import pandas as pd
+
+        frames = [
+            penalty_times.assign(team=team)[["team"] + list(penalty_times.columns)]
+            for team, penalty_times in penalty_times_by_team.items()
+        ]
+        pd.concat(frames, ignore_index=True).to_csv(output, index=False)
+    else:
+        penalties = {
+            team: json.loads(penalty_times.to_json(orient="records"))
+            for team, penalty_times in penalty_times_by_team.items()
+        }
+        output.write(json.dumps(penalties) + "\n")
+
+
+@program_run.command()
+@click.option('--events', 'sizes', default=[20, 60, 120], multiple=True, type=int, help='Number of events per synthetic match, can be repeated.')
+@click.option('--penalty-share', default=0.6, type=float, help='Share of penalties among all events.')
+@click.option('--engine', 'engines', default=['python'], multiple=True, type=click.Choice(['python', 'pandas']), help='Timekeeping engine, can be repeated.')
+@click.option('--repeat', default=5, type=int, help='Number of timed runs per benchmark.')
+@click.option('--no-plot', is_flag=True, help='Skip the plot preparation benchmark.')
+@click.option('--seed', default=0, type=int, help='Seed of the synthetic matches.')
+@click.option('--output', default=None, type=click.Path(dir_okay=False), help='Write the results to a JSON file.')
+@click.option('--baseline', default=None, type=click.Path(exists=True, dir_okay=False), help='Fail if slower than these results.')
+@click.option('--tolerance', default=0.2, type=float, help='Allowed relative slowdown against the baseline.')
+def benchmark(sizes, penalty_share, engines, repeat, no_plot, seed, output, baseline, tolerance):
+    """Time the timekeeping hot paths on synthetic matches"""
+    from floorball_penalty_timekeeping.benchmark import compare_benchmarks
+    from floorball_penalty_timekeeping.benchmark import run_benchmarks
+    from floorball_penalty_timekeeping.benchmark import write_benchmarks
+
+    results = run_benchmarks(sizes, penalty_share, engines=engines, repeat=repeat, plot=not no_plot, seed=seed)
+    for result in results["results"]:
+        click.echo(f"{result['benchmark']:<32}{result['num_events']:>6} events  {result['median'] * 1000:10.3f} ms")
+
+    if output is not None:
+        write_benchmarks(results, output)
+
+    if baseline is not None:
+        with open(baseline, "r") as f:
+            regressions = compare_benchmarks(results, json.load(f), tolerance)
+        for regression in regressions:
+            click.echo(
+                f"Regression in {regression['benchmark']} with {regression['num_events']} events: "
+                f"{regression['ratio']:.2f} times the baseline.",
+                err=True,
+            )
+        if regressions:
+            raise SystemExit(1)
+
+
+@program_run.command()
+@click.option('--engine', default='python', type=click.Choice(['python', 'pandas']), help='Timekeeping engine to test.')
+@click.option('--oracle', default='pandas', type=click.Choice(['python', 'pandas']), help='Reference timekeeping engine.')
+@click.option('--matches', default=1000, type=int, help='Number of random matches.')
+@click.option('--max-events', default=16, type=int, help='Maximum number of events per match.')
+@click.option('--seed', default=0, type=int, help='Seed of the first match.')
+def fuzz(engine, oracle, matches, max_events, seed):
+    """Compare a timekeeping engine with the reference on random matches"""
+    from floorball_penalty_timekeeping.fuzz import differential
+
+    report = differential(engine, oracle, matches=matches, seed=seed, max_events=max_events)
+    click.echo(f"{report.matches} matches in {report.seconds:.1f} s ({report.matches_per_second:.0f} per second)")
+    for mismatch in report.mismatches:
+        click.echo(f"Mismatch for seed {mismatch.seed}, minimal events:", err=True)
+        for name, result in [(oracle, mismatch.expected), (engine, mismatch.result)]:
+            if "error" in result:
+                click.echo(f"{name} raised {result['error']}", err=True)
+        click.echo(json.dumps(mismatch.events, indent=2), err=True)
+    if not report.ok:
+        raise SystemExit(1)
+
+
+@program_run.command()
+@click.option('--host', default='127.0.0.1', help='Address to listen on.')
+@click.option('--port', default=8000, type=int, help='Port to listen on.')
+@click.option('--log-dir', default=None, type=click.Path(file_okay=False), help='Log the events to and recover the matches from this directory.')
+@click.option('--match-duration', default=None, type=click.IntRange(min=1), help='Length of the matches in minutes including overtime.')
+def serve(host, port, log_dir, match_duration):
+    """Serve live timekeeping of many matches over HTTP"""
+    import asyncio
+    from dataclasses import replace
+
+    from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+    from floorball_penalty_timekeeping.server import serve
+
+    rules = None if match_duration is None else replace(DEFAULT_RULES, match_duration=match_duration * 60)
+    click.echo(f"Serving timekeeping on http://{host}:{port}/matches")
+    asyncio.run(serve(host, port, log_dir, rules))
@@ -0,0 +1,364 @@
+import heapq
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from floorball_penalty_timekeeping.intervals import pauses_frame
+from floorball_penalty_timekeeping.intervals import personal_penalty_times
+from floorball_penalty_timekeeping.intervals import to_time
+from floorball_penalty_timekeeping.results import PERSONAL_EVENT_OFFSET
+from floorball_penalty_timekeeping.results import PenaltyTable
+from floorball_penalty_timekeeping.rules import compiled_rules
+
+COLUMNS = ["event_id", "player", "to_bench", "time_start", "time_end"]
+END_OF_MATCH = 10000
+
+
+class Penalty:
+    __slots__ = ("index", "event_id", "player", "to_bench", "duration", "time_start", "time_end")
+
+    def __init__(self, index, event_id, player, to_bench, duration):
+        self.index = index
+        self.event_id = event_id
+        self.player = player
+        self.to_bench = to_bench
+        self.duration = duration
+        self.time_start = None
+        self.time_end = None
+
+    def copy(self):
+        other = Penalty(self.index, self.event_id, self.player, self.to_bench, self.duration)
+        other.time_start = self.time_start
+        other.time_end = self.time_end
+        return other
+
+
+class PersonalPenalty:
+    __slots__ = ("event_id", "player", "to_bench", "time_start", "time_end", "pauses", "time_on_bench", "version")
+
+    def __init__(self, event_id, player, to_bench):
+        self.event_id = event_id
+        self.player = player
+        self.to_bench = to_bench
+        self.time_start = None
+        self.time_end = None
+        self.pauses = []
+        self.time_on_bench = None
+        # version of the replacement penalties the pauses were derived from
+        self.version = None
+
+    def copy(self):
+        other = PersonalPenalty(self.event_id, self.player, self.to_bench)
+        other.time_start = self.time_start
+        other.time_end = self.time_end
+        other.pauses = self.pauses
+        other.time_on_bench = self.time_on_bench
+        other.version = self.version
+        return other
+
+
+class TeamState:
+    """Penalty bookkeeping of a single team.
+
+    Running penalties are kept in a heap ordered by due end time and row
+    index, penalties that have not started yet in one queue per player.
+    """
+
+    __slots__ = (
+        "rules", "penalties", "personal_penalties", "penalties_by_player", "running",
+        "running_players", "waiting", "versions",
+    )
+
+    def __init__(self, rules=None):
+        self.rules = compiled_rules() if rules is None else rules
+        self.penalties = []
+        self.personal_penalties = []
+        self.penalties_by_player = {}
+        self.running = []
+        self.running_players = {}
+        self.waiting = {}
+        # changes to the bench times of a player, used to update personal penalties lazily
+        self.versions = {}
+
+    def copy(self):
+        other = TeamState(self.rules)
+        other.penalties = [penalty.copy() for penalty in self.penalties]
+        other.personal_penalties = [penalty.copy() for penalty in self.personal_penalties]
+        for penalty in other.penalties:
+            other.penalties_by_player.setdefault(penalty.player, []).append(penalty)
+        other.running = self.running.copy()
+        other.running_players = self.running_players.copy()
+        other.waiting = {
+            player: deque(other.penalties[penalty.index] for penalty in queue)
+            for player, queue in self.waiting.items()
+        }
+        other.versions = self.versions.copy()
+        return other
+
+    @property
+    def num_running(self):
+        return len(self.running)
+
+    def _start(self, penalty, time_start):
+        penalty.time_start = time_start
+        queue = self.waiting[penalty.player]
+        queue.popleft()
+        if not queue:
+            del self.waiting[penalty.player]
+        heapq.heappush(self.running, (time_start + penalty.duration, penalty.index))
+        self.running_players[penalty.player] = self.running_players.get(penalty.player, 0) + 1
+
+    def _end(self, penalty, time_end):
+        penalty.time_end = time_end
+        self.versions[penalty.player] = self.versions.get(penalty.player, 0) + 1
+        self.running_players[penalty.player] -= 1
+
+    def _available(self):
+        return [
+            queue[0] for player, queue in self.waiting.items()
+            if not self.running_players.get(player)
+        ]
+
+    def _next_available(self):
+        return min(self._available(), key=lambda penalty: penalty.index, default=None)
+
+    def advance(self, current_time):
+        # penalties end in the order of their due time, every freed slot
+        # starts the next available penalty at the time it was freed
+        iterations = 0
+        while self.running and self.running[0][0] <= current_time:
+            iterations += 1
+            time_end, index = heapq.heappop(self.running)
+            self._end(self.penalties[index], time_end)
+            while len(self.running) < self.rules.max_running:
+                penalty = self._next_available()
+                if penalty is None:
+                    break
+                self._start(penalty, time_end)
+        return iterations
+
+    def update_personal_penalties(self, current_time, event_codes):
+        for personal_penalty in self.personal_penalties:
+            if personal_penalty.time_end is not None:
+                continue
+            duration = self.rules.personal_duration(event_codes[personal_penalty.event_id])
+            if duration is None:
+                continue
+
+            player = f"Bgl. {personal_penalty.player}"
+            version = self.versions.get(player, 0)
+            if personal_penalty.version != version:
+                personal_penalty.version = version
+                replacements = self.penalties_by_player.get(player, [])
+                time_start, pause_starts, pause_ends, time_on_bench = personal_penalty_times(
+                    [penalty.to_bench for penalty in replacements],
+                    [_nan(penalty.time_end) for penalty in replacements],
+                )
+                personal_penalty.time_start = to_time(time_start)
+                personal_penalty.pauses = [
+                    (to_time(start), to_time(end)) for start, end in zip(pause_starts, pause_ends)
+                ]
+                personal_penalty.time_on_bench = to_time(time_on_bench)
+
+            if personal_penalty.time_start is None or personal_penalty.time_on_bench is None:
+                continue
+
+            if current_time - personal_penalty.time_start - personal_penalty.time_on_bench >= duration:
+                personal_penalty.time_end = personal_penalty.time_start + personal_penalty.time_on_bench + duration
+
+    def add_penalty(self, event_id, player, event, current_time):
+        rules = self.rules
+        if rules.personal[event]:
+            self.personal_penalties.append(PersonalPenalty(event_id, player, current_time))
+            player = f"Bgl. {player}"
+        elif any(
+            personal_penalty.time_end is None and personal_penalty.player == player
+            for personal_penalty in self.personal_penalties
+        ):
+            player = f"Bgl. {player}"
+
+        next_index = len(self.penalties)
+        for index in range(next_index, next_index + rules.bench_penalties[event]):
+            penalty = Penalty(index, event_id, player, current_time, rules.bench_durations[event])
+            self.penalties.append(penalty)
+            self.versions[player] = self.versions.get(player, 0) + 1
+            self.penalties_by_player.setdefault(player, []).append(penalty)
+            self.waiting.setdefault(player, deque()).append(penalty)
+
+        if len(self.running) < rules.max_running and not self.running_players.get(player):
+            if self.waiting[player][0].index == next_index:
+                self._start(self.penalties[next_index], current_time)
+
+    def terminate_earliest(self, current_time):
+        # the earliest started penalty, which need not end first if durations differ
+        entry = min(self.running, key=lambda entry: (self.penalties[entry[1]].time_start, entry[1]))
+        self.running.remove(entry)
+        heapq.heapify(self.running)
+        self._end(self.penalties[entry[1]], current_time)
+        penalty = self._next_available()
+        if penalty is not None:
+            self._start(penalty, current_time)
+
+    def to_frame(self):
+        penalty_times = pd.DataFrame(
+            [
+                [penalty.event_id, penalty.player, penalty.to_bench, _nan(penalty.time_start), _nan(penalty.time_end)]
+                for penalty in self.penalties
+            ],
+            columns=COLUMNS,
+            dtype=object,
+        )
+        personal_penalties = pd.DataFrame(
+            [
+                [penalty.event_id + PERSONAL_EVENT_OFFSET, penalty.player, penalty.to_bench, _nan(penalty.time_start), _nan(penalty.time_end)]
+                for penalty in self.personal_penalties
+            ],
+            columns=COLUMNS,
+            dtype=object,
+        )
+        return pd.concat([penalty_times, personal_penalties])
+
+    def to_table(self):
+        return PenaltyTable.from_records(
+            [
+                (penalty.event_id, penalty.player, penalty.to_bench, penalty.time_start, penalty.time_end)
+                for penalty in self.penalties
+            ] + [
+                (penalty.event_id + PERSONAL_EVENT_OFFSET, penalty.player, penalty.to_bench, penalty.time_start, penalty.time_end)
+                for penalty in self.personal_penalties
+            ],
+            personal=[False] * len(self.penalties) + [True] * len(self.personal_penalties),
+        )
+
+    def pauses_frame(self):
+        return pauses_frame(
+            (penalty.event_id + PERSONAL_EVENT_OFFSET, penalty.player, penalty.pauses)
+            for penalty in self.personal_penalties
+        )
+
+
+class MatchState:
+    """Event-driven penalty state of a match, advanced one event at a time."""
+
+    __slots__ = ("teams", "team_states", "event_codes", "profiler", "rules")
+
+    def __init__(self, teams, event_codes, profiler=None, rules=None):
+        self.rules = compiled_rules(rules)
+        self.teams = list(teams)
+        self.team_states = {team: TeamState(self.rules) for team in self.teams}
+        self.event_codes = event_codes
+        self.profiler = profiler
+
+    def copy(self):
+        other = MatchState(self.teams, self.event_codes.copy(), self.profiler)
+        other.rules = self.rules
+        other.team_states = {team: state.copy() for team, state in self.team_states.items()}
+        return other
+
+    def process_event(self, event_id, team, player, event, current_time):
+        if self.profiler is not None:
+            return self._process_event_profiled(event_id, team, player, event, current_time)
+
+        for state in self.team_states.values():
+            state.advance(current_time)
+            state.update_personal_penalties(current_time, self.event_codes)
+
+        if event in self.rules.penalty_events:
+            self.team_states[team].add_penalty(event_id, player, event, current_time)
+
+        if event in self.rules.terminating_events:
+            self._terminate_by_goal(team, current_time)
+
+    def _terminate_by_goal(self, team, current_time):
+        other_team = next(other for other in self.teams if other != team)
+        penalized = self.team_states[other_team]
+        if penalized.num_running > self.team_states[team].num_running:
+            penalized.terminate_earliest(current_time)
+        return other_team
+
+    def _process_event_profiled(self, event_id, team, player, event, current_time):
+        profiler = self.profiler
+
+        def record(phase, team, start, iterations=0):
+            state = self.team_states[team]
+            profiler.record(
+                phase, team, event_id, current_time, start, perf_counter() - start, iterations,
+                len(state.penalties), len(state.personal_penalties),
+            )
+
+        for state_team, state in self.team_states.items():
+            start = perf_counter()
+            iterations = state.advance(current_time)
+            record("start_penalties", state_team, start, iterations)
+
+            num_open = sum(personal_penalty.time_end is None for personal_penalty in state.personal_penalties)
+            start = perf_counter()
+            state.update_personal_penalties(current_time, self.event_codes)
+            record("personal_penalties", state_team, start, num_open)
+
+        if event in self.rules.penalty_events:
+            start = perf_counter()
+            self.team_states[team].add_penalty(event_id, player, event, current_time)
+            record("add_penalty", team, start)
+
+        if event in self.rules.terminating_events:
+            start = perf_counter()
+            other_team = self._terminate_by_goal(team, current_time)
+            record("goal_termination", other_team, start)
+
+    def finish(self):
+        for current_time in [END_OF_MATCH, END_OF_MATCH + 1]:
+            self.process_event(current_time, self.teams[0], "0", 999, current_time)
+
+    def to_frames(self):
+        return {team: self.team_states[team].to_frame() for team in self.teams}
+
+    def to_tables(self):
+        return {team: self.team_states[team].to_table() for team in self.teams}
+
+    def pauses_frames(self):
+        return {team: self.team_states[team].pauses_frame() for team in self.teams}
+
+
+def _nan(value):
+    return np.nan if value is None else value
+
+
+def match_teams(ordered_events):
+    teams = ordered_events["team"].unique().tolist()
+    if len(teams) == 1:
+        teams += ["EasterEgg"]
+    return teams
+
+
+def event_records(ordered_events):
+    return zip(
+        ordered_events["index"].tolist(),
+        ordered_events["team"].tolist(),
+        ordered_events["player"].tolist(),
+        ordered_events["event"].tolist(),
+        ordered_events["seconds"].tolist(),
+    )
+
+
+def replay(ordered_events, profiler=None, rules=None):
+    match = MatchState(match_teams(ordered_events), ordered_events["event"].tolist(), profiler, rules)
+    for record in event_records(ordered_events):
+        match.process_event(*record)
+    return match
+
+
+def simulate(ordered_events, profiler=None, rules=None):
+    match = replay(ordered_events, profiler, rules)
+    match.finish()
+    return match
+
+
+def timekeeping_python(ordered_events, profiler=None, return_pauses=False, as_tables=False, rules=None):
+    match = simulate(ordered_events, profiler, rules)
+    penalty_times_by_team = match.to_tables() if as_tables else match.to_frames()
+    if return_pauses:
+        return penalty_times_by_team, match.pauses_frames()
+    return penalty_times_by_team
@@ -0,0 +1,206 @@
+import random
+import time
+from dataclasses import dataclass
+from dataclasses import field
+
+import pandas as pd
+
+from floorball_penalty_timekeeping.results import penalty_rows
+from floorball_penalty_timekeeping.rules import MATCH_DURATION
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+EVENT_WEIGHTS = {0: 0.3, 1: 0.05, 2: 0.35, 4: 0.1, 3: 0.15, 5: 0.05}
+# gaps between events, small and penalty-length gaps make penalties overlap and end together
+GAPS = [0, 0, 1, 5, 10, 30, 60, 110, 120, 130, 240, 600]
+SIMPLER_EVENTS = {1: 0, 3: 2, 4: 2, 5: 3}
+
+
+@dataclass
+class Mismatch:
+    seed: int | None
+    events: list
+    expected: dict
+    result: dict
+    original_events: list | None = None
+
+
+@dataclass
+class FuzzReport:
+    matches: int = 0
+    seconds: float = 0.0
+    mismatches: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches
+
+    @property
+    def matches_per_second(self) -> float:
+        return self.matches / self.seconds if self.seconds else 0.0
+
+
+def generate_events(seed=None, num_events=None, max_events=16, num_players=6, duration=MATCH_DURATION, shuffle=True):
+    """Create a random match in the input layout that obeys the rules.
+
+    A second personal penalty of a player becomes a match penalty, players
+    with a match penalty take no part in later events and all events happen
+    within ``duration`` seconds. Events are clustered to hit the cap of
+    running penalties and penalties ending at the same time. With
+    ``shuffle`` the input order differs from the chronological order.
+    """
+    rng = random.Random(seed)
+    if num_events is None:
+        num_events = rng.randint(1, max_events)
+
+    events = []
+    personal = {}
+    ejected = set()
+    second = rng.randrange(duration)
+    codes = list(EVENT_WEIGHTS)
+    weights = list(EVENT_WEIGHTS.values())
+    for _ in range(num_events):
+        if second >= duration:
+            break
+        team = rng.choice(["A", "B"])
+        players = [player for player in range(1, num_players + 1) if (team, player) not in ejected]
+        if not players:
+            continue
+
+        player = rng.choice(players)
+        event = rng.choices(codes, weights)[0]
+        if event == 3 and (team, player) in personal:
+            event = 5
+        if event == 3:
+            personal[team, player] = second
+        elif event == 5:
+            ejected.add((team, player))
+
+        events.append({
+            "team": team,
+            "player": str(player),
+            "event": event,
+            "minutes": second // 60,
+            "seconds": second % 60,
+        })
+        second += rng.choice(GAPS)
+
+    if shuffle:
+        rng.shuffle(events)
+    return events
+
+
+def _ordered_events(events):
+    return prepare_events(pd.DataFrame(events))
+
+
+def _pauses_records(pauses):
+    return [
+        tuple(None if pd.isna(value) else value for value in row)
+        for row in pauses.itertuples(index=False, name=None)
+    ]
+
+
+def outcome(engine, ordered_events, rules=None):
+    """Comparable result of an engine: the penalty rows and pauses, or the error.
+
+    ``engine`` is the name of a timekeeping engine or a callable with the
+    signature of ``timekeeping(ordered_events, return_pauses=True)``.
+    """
+    try:
+        if callable(engine):
+            penalty_times_by_team, pauses_by_team = engine(ordered_events.copy())
+        else:
+            penalty_times_by_team, pauses_by_team = timekeeping(
+                ordered_events.copy(), engine=engine, return_pauses=True, as_tables=True, rules=rules
+            )
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "penalties": penalty_rows(penalty_times_by_team),
+        "pauses": {team: _pauses_records(pauses) for team, pauses in pauses_by_team.items()},
+    }
+
+
+def check(events, candidate, oracle="pandas", seed=None, rules=None):
+    """Run both engines on the events, return a :class:`Mismatch` if they differ or raise."""
+    ordered_events = _ordered_events(events)
+    expected = outcome(oracle, ordered_events, rules)
+    result = outcome(candidate, ordered_events, rules)
+    # the events follow the rules, an engine raising is a finding even if both raise alike
+    if result != expected or "error" in result or "error" in expected:
+        return Mismatch(seed, events, expected, result)
+    return None
+
+
+def shrink(events, fails):
+    """Smallest events found by removing and simplifying events while ``fails`` holds."""
+    events = list(events)
+    changed = True
+    while changed:
+        changed = False
+        for candidate in _smaller(events):
+            if fails(candidate):
+                events = candidate
+                changed = True
+                break
+    return events
+
+
+def _smaller(events):
+    # remove chunks of events, from halves down to single events
+    size = len(events) // 2
+    while size >= 1:
+        for start in range(0, len(events), size):
+            candidate = events[:start] + events[start + size:]
+            if candidate:
+                yield candidate
+        size //= 2
+
+    for position, event in enumerate(events):
+        for simpler in _simpler_events(event):
+            yield events[:position] + [simpler] + events[position + 1:]
+
+
+def _simpler_events(event):
+    second = event["minutes"] * 60 + event["seconds"]
+    for simpler_second in [second // 60 * 60, second // 2, second - 1]:
+        if 0 <= simpler_second < second:
+            yield {**event, "minutes": simpler_second // 60, "seconds": simpler_second % 60}
+    if event["event"] in SIMPLER_EVENTS:
+        yield {**event, "event": SIMPLER_EVENTS[event["event"]]}
+    if event["player"] != "1":
+        yield {**event, "player": "1"}
+    if event["team"] != "A":
+        yield {**event, "team": "A"}
+
+
+def differential(candidate, oracle="pandas", matches=1000, seed=0, max_mismatches=1, shrink_mismatches=True, rules=None, **generator_options):
+    """Compare a candidate engine with the oracle on random rule-valid matches.
+
+    Match ``i`` is generated with the seed ``seed + i``, so every mismatch
+    can be reproduced from its seed. Errors of either engine count as
+    mismatches. Mismatching events are shrunk to a
+    minimal reproduction unless ``shrink_mismatches`` is false, the run
+    stops after ``max_mismatches`` mismatches. Named engines follow
+    ``rules``, callables are expected to apply their own.
+    """
+    report = FuzzReport()
+    start = time.perf_counter()
+    for match_seed in range(seed, seed + matches):
+        events = generate_events(match_seed, **generator_options)
+        mismatch = check(events, candidate, oracle, match_seed, rules)
+        report.matches += 1
+        if mismatch is None:
+            continue
+
+        if shrink_mismatches:
+            shrunk = shrink(events, lambda events: check(events, candidate, oracle, rules=rules) is not None)
+            mismatch = check(shrunk, candidate, oracle, match_seed, rules)
+            mismatch.original_events = events
+        report.mismatches.append(mismatch)
+        if len(report.mismatches) >= max_mismatches:
+            break
+    report.seconds = time.perf_counter() - start
+    return report
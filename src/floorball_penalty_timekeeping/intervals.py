@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+PAUSE_COLUMNS = ["event_id", "player", "pause", "time_start", "time_end"]
+
+
+def merge_intervals(starts, ends):
+    """Merge overlapping intervals given in order of their start.
+
+    Missing ends (NaN) mark intervals that are still open, they swallow all
+    later intervals. Returns the starts and ends of the merged intervals as
+    float arrays, open ends are NaN.
+    """
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    if len(starts) == 0:
+        return starts, ends
+
+    reach = np.maximum.accumulate(np.where(np.isnan(ends), np.inf, ends))
+    is_first = np.empty(len(starts), dtype=bool)
+    is_first[0] = True
+    is_first[1:] = starts[1:] > reach[:-1]
+
+    last = np.append(np.flatnonzero(is_first)[1:] - 1, len(starts) - 1)
+    merged_ends = reach[last]
+    merged_ends[np.isinf(merged_ends)] = np.nan
+    return starts[is_first], merged_ends
+
+
+def personal_penalty_times(to_bench, time_end):
+    """Start, pauses and time on the bench of a personal penalty.
+
+    The personal penalty starts when the first replacement penalty ("Bgl.")
+    ended and is paused while later replacement penalties are on the bench.
+    The time on the bench is NaN while a replacement penalty is still open.
+    """
+    starts, ends = merge_intervals(to_bench, time_end)
+    if len(starts) == 0:
+        return np.nan, starts, ends, np.nan
+    pause_starts, pause_ends = starts[1:], ends[1:]
+    return ends[0], pause_starts, pause_ends, (pause_ends - pause_starts).sum()
+
+
+def to_time(value, missing=None):
+    if np.isnan(value):
+        return missing
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def pauses_frame(pauses_by_penalty):
+    """Long-format table of the pauses of personal penalties.
+
+    Takes ``(event_id, player, pauses)`` triples where ``pauses`` is a list
+    of ``(start, end)`` pairs.
+    """
+    records = [
+        [event_id, player, pause, start, end]
+        for event_id, player, pauses in pauses_by_penalty
+        for pause, (start, end) in enumerate(pauses, start=1)
+    ]
+    pauses = pd.DataFrame(records, columns=PAUSE_COLUMNS)
+    return pauses.astype({"pause": int, "time_start": float, "time_end": float})
@@ -1,10 +1,363 @@
 import json
+import mmap
+import os
+import struct
 
+import numpy as np
 import pandas as pd
 
+from floorball_penalty_timekeeping.results import PenaltyTable
+from floorball_penalty_timekeeping.results import as_penalty_table
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+CHUNK_SIZE = 1 << 16
+ARCHIVE_MAGIC = b"FBPTARC\x01"
+ARCHIVE_ALIGNMENT = 8
+ARCHIVE_EVENT_COLUMNS = ["team", "player", "event", "minutes", "seconds"]
+ARCHIVE_EVENT_ARRAYS = ["seconds", "player", "team", "event"]
+
 
 def events_from_json(path, name):
     with open(path, "r") as f:
         data = json.load(f)
 
     return pd.DataFrame(data[name])
+
+
+class _JSONStream:
+    """Decode consecutive JSON tokens from a file without reading it at once."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+
+    def _read(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                raise ValueError("Unexpected end of JSON file.")
+
+    def expect(self, characters):
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(f"Expected one of '{characters}' but found '{character}'.")
+        self.position += 1
+        return character
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, self.position = self.decoder.raw_decode(self.buffer, self.position)
+                return value
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+
+
+def iter_matches_json(path, chunk_size=CHUNK_SIZE):
+    """Yield ``(name, events)`` of a JSON object file match by match.
+
+    Only a single match is held in memory at a time.
+    """
+    with open(path, "r") as f:
+        stream = _JSONStream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            name = stream.decode()
+            stream.expect(":")
+            yield name, stream.decode()
+            if stream.expect(",}") == "}":
+                return
+
+
+def iter_matches_jsonl(path):
+    """Yield ``(name, events)`` of a JSON lines file with one match per line.
+
+    Every line is an object ``{"match": name, "events": [...]}``.
+    """
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record["match"], record["events"]
+
+
+def is_jsonl(path):
+    return os.path.splitext(path)[1].lower() in [".jsonl", ".ndjson"]
+
+
+def matches_from_json(path):
+    matches = iter_matches_jsonl(path) if is_jsonl(path) else iter_matches_json(path)
+    for name, events in matches:
+        yield name, pd.DataFrame(events)
+
+
+def write_matches_jsonl(matches, path):
+    if isinstance(matches, dict):
+        matches = matches.items()
+
+    with open(path, "w") as f:
+        for name, events in matches:
+            if isinstance(events, pd.DataFrame):
+                events = events.to_dict(orient="records")
+            f.write(json.dumps({"match": name, "events": events}) + "\n")
+
+
+def index_path_for(path):
+    return f"{path}.index.json"
+
+
+def build_match_index(path, index_path=None):
+    """Write a sidecar file with the byte offset of every match of a JSON lines file."""
+    offsets = {}
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                offsets[json.loads(line)["match"]] = offset
+            offset += len(line)
+
+    stat = os.stat(path)
+    index = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "offsets": offsets}
+    with open(index_path or index_path_for(path), "w") as f:
+        json.dump(index, f)
+
+    return offsets
+
+
+def load_match_index(path, index_path=None):
+    index_path = index_path or index_path_for(path)
+    if os.path.exists(index_path):
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        stat = os.stat(path)
+        if index["size"] == stat.st_size and index["mtime_ns"] == stat.st_mtime_ns:
+            return index["offsets"]
+
+    return build_match_index(path, index_path)
+
+
+def events_from_jsonl(path, name, index_path=None):
+    offsets = load_match_index(path, index_path)
+    with open(path, "rb") as f:
+        f.seek(offsets[name])
+        record = json.loads(f.readline())
+
+    return pd.DataFrame(record["events"])
+
+
+class _Dictionary:
+    """Dictionary encoding of teams and players, keeps ints and strings apart."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, values):
+        codes = np.empty(len(values), dtype=np.uint32)
+        for i, value in enumerate(values):
+            value = value.item() if isinstance(value, np.generic) else value
+            key = (type(value).__name__, value)
+            if key not in self._codes:
+                self._codes[key] = len(self.values)
+                self.values.append(value)
+            codes[i] = self._codes[key]
+        return codes
+
+
+def _write_arrays(f, arrays):
+    offsets = []
+    for array in arrays:
+        offsets.append(f.tell())
+        f.write(np.ascontiguousarray(array).astype(array.dtype.newbyteorder("<"), copy=False).tobytes())
+        f.write(b"\0" * (-f.tell() % ARCHIVE_ALIGNMENT))
+    return offsets
+
+
+def write_match_archive(matches, path, engine="python"):
+    """Write matches to a binary archive, see :class:`MatchArchive`.
+
+    ``matches`` yields ``(name, events)`` or ``(name, events, penalty_tables)``
+    with the events as read by :func:`events_from_json` and the penalty
+    tables as returned by ``timekeeping(..., as_tables=True)``. Missing
+    penalty tables are computed.
+    """
+    if isinstance(matches, dict):
+        matches = matches.items()
+
+    teams = _Dictionary()
+    players = _Dictionary()
+    index = []
+    with open(path, "wb") as f:
+        f.write(ARCHIVE_MAGIC + struct.pack("<Q", 0))
+        for name, events, *penalty_tables in matches:
+            events = pd.DataFrame(events)
+            columns = {column.lower(): column for column in events.columns}
+            unknown = set(columns) - set(ARCHIVE_EVENT_COLUMNS)
+            if unknown:
+                raise ValueError(f"Match {name!r} has unsupported columns {', '.join(sorted(unknown))}.")
+            if not events.empty and not events[columns["event"]].isin(list(DEFAULT_RULES.events)).all():
+                raise ValueError(f"Match {name!r} has unknown event codes.")
+
+            if penalty_tables:
+                penalty_tables = penalty_tables[0]
+            elif events.empty:
+                penalty_tables = {}
+            else:
+                penalty_tables = timekeeping(prepare_events(events.copy()), engine=engine, as_tables=True)
+
+            num_events = len(events)
+            event_offsets = []
+            if num_events > 0:
+                seconds = events[columns["minutes"]].to_numpy() * 60 + events[columns["seconds"]].to_numpy()
+                event_offsets = _write_arrays(f, [
+                    seconds.astype(np.int32),
+                    players.encode(events[columns["player"]].tolist()),
+                    teams.encode(events[columns["team"]].tolist()).astype(np.uint16),
+                    events[columns["event"]].to_numpy().astype(np.uint8),
+                ])
+
+            penalties = []
+            for team, table in penalty_tables.items():
+                table = as_penalty_table(table)
+                offsets = _write_arrays(f, [
+                    table.event_id,
+                    table.to_bench,
+                    table.time_start,
+                    table.time_end,
+                    players.encode(table.player),
+                    table.personal.astype(np.uint8),
+                ])
+                penalties.append({"team": team, "rows": len(table), "offsets": offsets})
+
+            index.append({
+                "name": name,
+                "columns": list(events.columns),
+                "rows": num_events,
+                "offsets": event_offsets,
+                "penalties": penalties,
+            })
+
+        if len(teams.values) > np.iinfo(np.uint16).max + 1:
+            raise ValueError("A match archive holds at most 65536 different teams.")
+        footer = f.tell()
+        meta = {"version": 2, "teams": teams.values, "players": players.values, "matches": index}
+        f.write(json.dumps(meta).encode())
+        f.seek(len(ARCHIVE_MAGIC))
+        f.write(struct.pack("<Q", footer))
+
+
+class MatchArchive:
+    """Memory-mapped reader of an archive written by :func:`write_match_archive`.
+
+    Events are stored per match as int32 game seconds, uint8 event codes and
+    dictionary-encoded teams and players. :meth:`event_arrays` and
+    :meth:`penalty_tables` return views into the mapped file, only the
+    decoded players and teams are copied. :meth:`events` rebuilds the
+    DataFrame of :func:`events_from_json`, minutes and seconds are returned
+    normalized (seconds below 60), which does not change the prepared events.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a match archive.")
+        footer, = struct.unpack_from("<Q", self._mmap, len(ARCHIVE_MAGIC))
+        meta = json.loads(self._mmap[footer:])
+        self.teams = np.empty(len(meta["teams"]), dtype=object)
+        self.teams[:] = meta["teams"]
+        self.players = np.empty(len(meta["players"]), dtype=object)
+        self.players[:] = meta["players"]
+        self._matches = {match["name"]: match for match in meta["matches"]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            # arrays handed out keep the mapping alive until they are released
+            pass
+
+    def __len__(self):
+        return len(self._matches)
+
+    def __contains__(self, name):
+        return name in self._matches
+
+    def __iter__(self):
+        for name in self._matches:
+            yield name, self.events(name)
+
+    @property
+    def names(self):
+        return list(self._matches)
+
+    def _view(self, dtype, rows, offset):
+        return np.frombuffer(self._mmap, dtype=np.dtype(dtype).newbyteorder("<"), count=rows, offset=offset)
+
+    def event_arrays(self, name):
+        """Zero-copy ``seconds``, ``player``, ``team`` and ``event`` codes of a match."""
+        match = self._matches[name]
+        if match["rows"] == 0:
+            return {
+                column: np.empty(0, dtype=dtype)
+                for column, dtype in zip(ARCHIVE_EVENT_ARRAYS, [np.int32, np.uint32, np.uint16, np.uint8])
+            }
+        return {
+            column: self._view(dtype, match["rows"], offset)
+            for column, dtype, offset in zip(
+                ARCHIVE_EVENT_ARRAYS, [np.int32, np.uint32, np.uint16, np.uint8], match["offsets"]
+            )
+        }
+
+    def events(self, name):
+        match = self._matches[name]
+        arrays = self.event_arrays(name)
+        minutes, seconds = np.divmod(arrays["seconds"].astype(np.int64), 60)
+        values = {
+            "team": self.teams[arrays["team"]].tolist(),
+            "player": self.players[arrays["player"]].tolist(),
+            "event": arrays["event"].astype(np.int64),
+            "minutes": minutes,
+            "seconds": seconds,
+        }
+        return pd.DataFrame({column: values[column.lower()] for column in match["columns"]})
+
+    def penalty_tables(self, name):
+        tables = {}
+        for penalties in self._matches[name]["penalties"]:
+            rows = penalties["rows"]
+            offsets = penalties["offsets"]
+            event_id, to_bench, time_start, time_end = [self._view(np.int32, rows, offset) for offset in offsets[:4]]
+            player = self.players[self._view(np.uint32, rows, offsets[4])]
+            # archives of version 1 have no personal column
+            personal = self._view(np.uint8, rows, offsets[5]).view(bool) if len(offsets) > 5 else None
+            tables[penalties["team"]] = PenaltyTable(event_id, player, to_bench, time_start, time_end, personal)
+        return tables
@@ -0,0 +1,92 @@
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+PHASES = ["start_penalties", "personal_penalties", "add_penalty", "goal_termination"]
+
+_active_profiler = ContextVar("timekeeping_profiler", default=None)
+
+
+class TimekeepingProfiler:
+    """Collects wall time and table sizes of every phase of every processed event.
+
+    Pass an instance to ``timekeeping(..., profiler=...)`` or activate it for
+    a block of code with :func:`profile_timekeeping`.
+    """
+
+    def __init__(self):
+        self.origin = perf_counter()
+        self.records = []
+
+    def record(self, phase, team, event, current_time, start, duration, iterations=0, num_penalties=0, num_personal_penalties=0):
+        self.records.append({
+            "phase": phase,
+            "team": team,
+            "event": event,
+            "time": current_time,
+            "start": start - self.origin,
+            "duration": duration,
+            "iterations": iterations,
+            "num_penalties": num_penalties,
+            "num_personal_penalties": num_personal_penalties,
+        })
+
+    def summary(self):
+        summary = {}
+        for record in self.records:
+            phase = summary.setdefault(record["phase"], {"calls": 0, "duration": 0.0, "iterations": 0})
+            phase["calls"] += 1
+            phase["duration"] += record["duration"]
+            phase["iterations"] += record["iterations"]
+        return summary
+
+    def to_json(self, path=None):
+        data = {"summary": self.summary(), "records": self.records}
+        if path is None:
+            return json.dumps(data, default=_builtin)
+        with open(path, "w") as f:
+            json.dump(data, f, default=_builtin)
+
+    def to_chrome_trace(self, path=None):
+        """Export in the Chrome trace event format (chrome://tracing, Perfetto)."""
+        teams = {}
+        trace_events = []
+        for record in self.records:
+            trace_events.append({
+                "name": record["phase"],
+                "cat": "timekeeping",
+                "ph": "X",
+                "ts": record["start"] * 1e6,
+                "dur": record["duration"] * 1e6,
+                "pid": 0,
+                "tid": teams.setdefault(record["team"], len(teams)),
+                "args": {
+                    key: record[key]
+                    for key in ["team", "event", "time", "iterations", "num_penalties", "num_personal_penalties"]
+                },
+            })
+        data = {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+        if path is None:
+            return json.dumps(data, default=_builtin)
+        with open(path, "w") as f:
+            json.dump(data, f, default=_builtin)
+
+
+def _builtin(value):
+    # numpy scalars from the pandas engine
+    return value.item()
+
+
+def active_profiler():
+    return _active_profiler.get()
+
+
+@contextmanager
+def profile_timekeeping(profiler=None):
+    profiler = profiler or TimekeepingProfiler()
+    token = _active_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active_profiler.reset(token)
@@ -0,0 +1,394 @@
+import heapq
+import os
+from dataclasses import dataclass
+from dataclasses import field
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from floorball_penalty_timekeeping.utils import format_mmss
+
+RENDERERS = ["matplotlib", "svg", "cached"]
+LANE_MODES = ["clusters", "colouring"]
+COLORS = {"A": "red", "B": "blue"}
+MARGIN = 0.05
+TABLE_TEMPLATE = "<table>\n<thead>\n<tr>{header}</tr>\n</thead>\n<tbody>\n{body}</tbody>\n</table>\n"
+ROW_TEMPLATE = "<tr{style}>{cells}</tr>\n"
+ATTRIBUTE_ENTITIES = {'"': "&quot;"}
+
+
+def default_renderer():
+    """Renderer of the result plot, configured by TIMEKEEPING_RENDERER."""
+    renderer = os.environ.get("TIMEKEEPING_RENDERER", "matplotlib")
+    if renderer not in RENDERERS:
+        msg = f"Unknown renderer {renderer!r}, use one of {', '.join(RENDERERS)}."
+        raise ValueError(msg)
+    return renderer
+
+
+def time_ticks(min_time, max_time):
+    major_time_step = 60
+    while (max_time - min_time) // major_time_step > 8:
+        major_time_step += 60
+
+    return np.arange(
+        int(min_time // major_time_step) * major_time_step,
+        int(max_time) + 1,
+        major_time_step
+    )
+
+
+def player_ticks(all_player_ticks):
+    major_ticks = sorted(all_player_ticks)
+    minor_ticks = (
+        [tick - 0.5 for tick in major_ticks]
+        + [-0.5] + [major_ticks[-1] + 0.5]
+    )
+    return major_ticks, minor_ticks
+
+
+def assign_lanes(y_base, to_bench, time_end, delta=0.25, mode="clusters"):
+    """Vertical positions of penalties, so that overlapping ones stay visible.
+
+    Returns the order of the rows, sorted by ``y_base`` and ``to_bench``, and
+    the positions of the rows in that order. ``clusters`` spreads chains of
+    penalties, in which every penalty goes to the bench before the previous
+    one ended, evenly around the line of the player. A missing end of the
+    previous penalty ends the chain, like in the original plot.
+    ``colouring`` assigns lanes like an interval graph colouring, overlapping
+    penalties of a player never share a lane and missing ends are open
+    intervals.
+    """
+    y_base = np.asarray(y_base, dtype=float)
+    to_bench = np.asarray(to_bench, dtype=float)
+    time_end = np.asarray(time_end, dtype=float)
+
+    order = np.lexsort((to_bench, y_base))
+    y_base, to_bench, time_end = y_base[order], to_bench[order], time_end[order]
+    n = len(order)
+    if n == 0:
+        return order, np.empty(0)
+
+    new_player = np.empty(n, dtype=bool)
+    new_player[0] = True
+    new_player[1:] = y_base[1:] != y_base[:-1]
+
+    if mode == "clusters":
+        new_cluster = new_player.copy()
+        new_cluster[1:] |= ~(to_bench[1:] <= time_end[:-1])
+        cluster = np.cumsum(new_cluster) - 1
+        starts = np.flatnonzero(new_cluster)
+        lane = np.arange(n) - starts[cluster]
+        num_lanes = np.diff(np.append(starts, n))[cluster]
+    elif mode == "colouring":
+        lane, num_lanes = _colour_intervals(new_player, to_bench, time_end)
+    else:
+        msg = f"Unknown lane mode {mode!r}, use one of {', '.join(LANE_MODES)}."
+        raise ValueError(msg)
+
+    # same values as np.linspace(y_base - delta, y_base + delta, num_lanes)
+    low, high = y_base - delta, y_base + delta
+    spread = num_lanes > 1
+    step = (high - low) / np.maximum(num_lanes - 1, 1)
+    position = np.where(spread, lane * step + low, y_base)
+    last = spread & (lane == num_lanes - 1)
+    position[last] = high[last]
+    return order, position
+
+
+def _colour_intervals(new_player, to_bench, time_end):
+    ends = np.where(np.isnan(time_end), np.inf, time_end)
+    n = len(to_bench)
+    lane = np.empty(n, dtype=int)
+    num_lanes = np.empty(n, dtype=int)
+
+    first = 0
+    lanes = 0
+    running = []
+    free = []
+    for i in range(n):
+        if new_player[i]:
+            num_lanes[first:i] = lanes
+            first, lanes, running, free = i, 0, [], []
+        while running and running[0][0] < to_bench[i]:
+            heapq.heappush(free, heapq.heappop(running)[1])
+        if free:
+            lane[i] = heapq.heappop(free)
+        else:
+            lane[i] = lanes
+            lanes += 1
+        heapq.heappush(running, (ends[i], lane[i]))
+    num_lanes[first:] = lanes
+    return lane, num_lanes
+
+
+@dataclass
+class PenaltyScene:
+    """Vector description of the penalty plot.
+
+    ``segments`` maps ``(team, kind)`` to ``(n, 2, 2)`` arrays of line
+    segments, kinds are ``waiting`` (to bench until start), ``running``
+    (start until end) and ``bench`` (vertical line at the time of the
+    penalty). Segments with a missing end are not drawn, but their known
+    ends are marked like in the matplotlib figure.
+    """
+
+    segments: dict = field(default_factory=dict)
+    colors: dict = field(default_factory=dict)
+    goals: np.ndarray = field(default_factory=lambda: np.empty((0, 2)))
+    goal_colors: list = field(default_factory=list)
+    xticks: list = field(default_factory=list)
+    xticklabels: list = field(default_factory=list)
+    yticks: list = field(default_factory=list)
+    yticklabels: list = field(default_factory=list)
+    yminorticks: list = field(default_factory=list)
+    xlim: tuple = (0, 1)
+    ylim: tuple = (0, 1)
+
+    def markers(self, team):
+        """Known ends of the waiting and running segments of a team."""
+        points = np.concatenate([
+            self.segments[team, kind].reshape(-1, 2) for kind in ["waiting", "running"]
+        ])
+        return points[~np.isnan(points).any(axis=1)]
+
+
+def _limits(values, ticks):
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    low, high = values.min(), values.max()
+    margin = (high - low) * MARGIN
+    return min(low - margin, min(ticks)), max(high + margin, max(ticks))
+
+
+def penalty_scene(penalties_to_plot, goals_to_plot, all_player_ticks=None, max_time=None, min_time=None, y_value_player_map=None):
+    """Build the scene from the output of the plot preparation in ``views``."""
+    scene = PenaltyScene()
+    xs = [np.asarray(goals_to_plot["seconds"], dtype=float)]
+    ys = [np.asarray(goals_to_plot["y_position"], dtype=float), [0]]
+
+    for team, df in penalties_to_plot.items():
+        to_bench = df["to_bench"].to_numpy(dtype=float)
+        time_start = df["time_start"].to_numpy(dtype=float)
+        time_end = df["time_end"].to_numpy(dtype=float)
+        y = df["y_position"].to_numpy(dtype=float)
+
+        scene.colors[team] = COLORS[team]
+        scene.segments[team, "waiting"] = np.stack([np.column_stack([to_bench, y]), np.column_stack([time_start, y])], axis=1)
+        scene.segments[team, "running"] = np.stack([np.column_stack([time_start, y]), np.column_stack([time_end, y])], axis=1)
+        scene.segments[team, "bench"] = np.stack([np.column_stack([to_bench, np.zeros(len(y))]), np.column_stack([to_bench, y])], axis=1)
+        xs += [to_bench, time_start, time_end]
+        ys.append(y)
+
+    scene.goals = np.column_stack([goals_to_plot["seconds"], goals_to_plot["y_position"]]).astype(float)
+    scene.goal_colors = list(goals_to_plot["color"])
+
+    scene.yticks, scene.yminorticks = player_ticks(all_player_ticks)
+    scene.yticklabels = [str(y_value_player_map[tick]) for tick in scene.yticks]
+    ticks = time_ticks(min_time, max_time)
+    scene.xticks = ticks.tolist()
+    scene.xticklabels = format_mmss(ticks).tolist()
+
+    scene.xlim = _limits(np.concatenate(xs), scene.xticks)
+    scene.ylim = _limits(np.concatenate(ys), scene.yticks + scene.yminorticks)
+    return scene
+
+
+def scene_to_svg(scene, width=640, height=480):
+    """Render the scene as a standalone SVG document."""
+    left, right, top, bottom = 0.125 * width, 0.9 * width, 0.12 * height, 0.89 * height
+    (x0, x1), (y0, y1) = scene.xlim, scene.ylim
+
+    def sx(x):
+        return left + (x - x0) / (x1 - x0) * (right - left)
+
+    def sy(y):
+        return bottom - (y - y0) / (y1 - y0) * (bottom - top)
+
+    def line(xa, ya, xb, yb, stroke, width=1.5, dashed=False):
+        dash = ' stroke-dasharray="5.5,2.4"' if dashed else ""
+        return (
+            f'<line x1="{sx(xa):.2f}" y1="{sy(ya):.2f}" x2="{sx(xb):.2f}" y2="{sy(yb):.2f}" '
+            f'stroke="{stroke}" stroke-width="{width}"{dash}/>'
+        )
+
+    def text(x, y, label, anchor):
+        return f'<text x="{x:.2f}" y="{y:.2f}" text-anchor="{anchor}" font-size="10">{escape(label)}</text>'
+
+    elements = []
+    for tick in scene.xticks:
+        elements.append(line(tick, y0, tick, y1, "#b0b0b0", width=0.8))
+    for tick in scene.yminorticks:
+        elements.append(line(x0, tick, x1, tick, "#b0b0b0", width=0.8))
+
+    elements.append(line(x0, 0, x1, 0, "black", width=0.8))
+    elements.append(line(x0, y0, x0, y1, "black", width=0.8))
+    for tick, label in zip(scene.xticks, scene.xticklabels):
+        elements.append(text(sx(tick), sy(0) + 14, label, "middle"))
+    for tick, label in zip(scene.yticks, scene.yticklabels):
+        elements.append(text(left - 6, sy(tick) + 3.5, label, "end"))
+
+    for (team, kind), segments in scene.segments.items():
+        color = scene.colors[team]
+        for (xa, ya), (xb, yb) in segments:
+            if np.isnan([xa, ya, xb, yb]).any():
+                continue
+            if kind == "bench":
+                elements.append(line(xa, ya, xb, yb, color, width=0.5, dashed=True))
+            else:
+                elements.append(line(xa, ya, xb, yb, color, dashed=kind == "waiting"))
+
+    for team in scene.colors:
+        for x, y in scene.markers(team):
+            elements.append(
+                f'<line x1="{sx(x):.2f}" y1="{sy(y) - 4:.2f}" x2="{sx(x):.2f}" y2="{sy(y) + 4:.2f}" '
+                f'stroke="{scene.colors[team]}" stroke-width="1"/>'
+            )
+
+    for (x, y), color in zip(scene.goals, scene.goal_colors):
+        elements.append(
+            f'<path d="M{sx(x) - 3:.2f},{sy(y) - 3:.2f}l6,6m0,-6l-6,6" stroke="{color}" stroke-width="1.5"/>'
+        )
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">'
+        + "".join(elements)
+        + "</svg>"
+    )
+
+
+class CachedFigure:
+    """Matplotlib figure that is built once and only updates changed artists.
+
+    ``updated`` holds the names of the artists changed by the last call of
+    :meth:`draw`.
+    """
+
+    def __init__(self):
+        self.fig = None
+        self.ax = None
+        self.updated = []
+        self._artists = {}
+        self._data = {}
+
+    def _create(self):
+        from matplotlib.figure import Figure
+
+        self.fig = Figure()
+        self.ax = self.fig.subplots(1)
+        self.ax.spines['bottom'].set_position(('data', 0))
+        self.ax.spines['top'].set_color('none')
+        self.ax.spines['right'].set_color('none')
+        self.ax.yaxis.set_ticks_position('left')
+        self.ax.xaxis.set_ticks_position('bottom')
+        self.ax.xaxis.grid(which="major")
+        self.ax.yaxis.grid(which="minor")
+        self.ax.set_axisbelow(True)
+
+    def _changed(self, name, data):
+        old = self._data.get(name)
+        if old is not None and _equal(old, data):
+            return False
+        self._data[name] = data
+        self.updated.append(name)
+        return True
+
+    def _artist(self, name, create):
+        if name not in self._artists:
+            self._artists[name] = create()
+        return self._artists[name]
+
+    def draw(self, scene):
+        from matplotlib.collections import LineCollection
+
+        if self.fig is None:
+            self._create()
+        self.updated = []
+        ax = self.ax
+
+        for (team, kind), segments in scene.segments.items():
+            name = f"{team}:{kind}"
+            if self._changed(name, segments):
+                style = {"linestyles": "--", "linewidths": 0.5} if kind == "bench" else {"linestyles": "--" if kind == "waiting" else "-"}
+                artist = self._artist(name, lambda: ax.add_collection(LineCollection([], colors=scene.colors[team], **style)))
+                artist.set_segments(segments[~np.isnan(segments).any(axis=(1, 2))])
+
+            markers = scene.markers(team)
+            if self._changed(f"{team}:markers", markers):
+                artist = self._artist(f"{team}:markers", lambda: ax.scatter([], [], marker="|", c=scene.colors[team]))
+                artist.set_offsets(markers)
+
+        for name in [name for name in self._artists if name.split(":")[0] not in scene.colors and name != "goals"]:
+            self._artists.pop(name).remove()
+            self._data.pop(name)
+            self.updated.append(name)
+
+        if self._changed("goals", (scene.goals, scene.goal_colors)):
+            artist = self._artist("goals", lambda: ax.scatter([], [], marker="x"))
+            artist.set_offsets(scene.goals)
+            artist.set_color(scene.goal_colors)
+
+        axes = (scene.xticks, scene.xticklabels, scene.yticks, scene.yticklabels, scene.yminorticks, scene.xlim, scene.ylim)
+        if self._changed("axes", axes):
+            ax.set_xticks(scene.xticks, scene.xticklabels)
+            ax.set_yticks(scene.yticks, scene.yticklabels)
+            ax.set_yticks(scene.yminorticks, minor=True)
+            ax.set_xlim(scene.xlim)
+            ax.set_ylim(scene.ylim)
+
+        return self.fig
+
+    def to_png(self, dpi=200):
+        buffer = BytesIO()
+        self.fig.savefig(buffer, format="png", bbox_inches="tight", dpi=dpi)
+        return buffer.getvalue()
+
+
+class HtmlTable:
+    """HTML table rendered from templates that only renders changed rows again.
+
+    Rendered rows are kept by their values, a row that did not change since
+    the last :meth:`render` is reused. ``row_style`` returns the CSS of a row
+    from a dict of its values. ``rendered`` counts the rows rendered by the
+    last call.
+    """
+
+    def __init__(self, columns, row_style=None):
+        self.columns = list(columns)
+        self.row_style = row_style
+        self.rendered = 0
+        self._header = "".join(f"<th>{escape(str(column))}</th>" for column in self.columns)
+        self._rows = {}
+
+    def render(self, rows):
+        self.rendered = 0
+        html_rows = []
+        kept = {}
+        for row in rows:
+            row = tuple(row)
+            html = kept.get(row) or self._rows.get(row)
+            if html is None:
+                html = self._render_row(row)
+                self.rendered += 1
+            kept[row] = html
+            html_rows.append(html)
+        # rows that are not shown anymore are dropped
+        self._rows = kept
+        return TABLE_TEMPLATE.format(header=self._header, body="".join(html_rows))
+
+    def _render_row(self, row):
+        style = ""
+        if self.row_style is not None:
+            style = f' style="{escape(self.row_style(dict(zip(self.columns, row))), ATTRIBUTE_ENTITIES)}"'
+        cells = "".join(f"<td>{escape(str(value))}</td>" for value in row)
+        return ROW_TEMPLATE.format(style=style, cells=cells)
+
+
+def _equal(old, new):
+    if isinstance(old, np.ndarray):
+        return isinstance(new, np.ndarray) and old.shape == new.shape and np.array_equal(old, new, equal_nan=True)
+    if isinstance(old, tuple):
+        return len(old) == len(new) and all(_equal(a, b) for a, b in zip(old, new))
+    return old == new
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+MISSING = -1
+# the engines shift the event_id of personal penalties, which is kept for the
+# rows and frames, tables mark personal penalties in their ``personal`` column
+PERSONAL_EVENT_OFFSET = 999
+TIME_COLUMNS = ["to_bench", "time_start", "time_end"]
+COLUMNS = ["event_id", "player"] + TIME_COLUMNS
+
+
+class PenaltyTable:
+    """Columnar penalty times of one team.
+
+    ``event_id`` and the time columns are int32 arrays, times of penalties
+    that did not start or end yet hold the sentinel ``MISSING``. ``player``
+    is an object array, as players are numbers or "Bgl." replacements.
+    ``personal`` is a bool array marking the personal penalties, without it
+    they are told apart by the ``PERSONAL_EVENT_OFFSET`` of their event_id,
+    which is only reliable for event ids below the offset.
+    """
+
+    __slots__ = COLUMNS + ["personal"]
+
+    def __init__(self, event_id, player, to_bench, time_start, time_end, personal=None):
+        self.event_id = np.asarray(event_id, dtype=np.int32)
+        self.player = np.asarray(player, dtype=object)
+        self.to_bench = np.asarray(to_bench, dtype=np.int32)
+        self.time_start = np.asarray(time_start, dtype=np.int32)
+        self.time_end = np.asarray(time_end, dtype=np.int32)
+        if personal is None:
+            personal = self.event_id >= PERSONAL_EVENT_OFFSET
+        self.personal = np.asarray(personal, dtype=bool)
+
+    def __len__(self):
+        return len(self.event_id)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, column).nbytes for column in COLUMNS + ["personal"])
+
+    @classmethod
+    def from_records(cls, records, personal=None):
+        """Create a table from ``(event_id, player, to_bench, time_start, time_end)`` rows.
+
+        Missing times may be given as ``None``.
+        """
+        records = list(records)
+        columns = [[] for _ in COLUMNS]
+        for record in records:
+            for column, value in zip(columns, record):
+                column.append(value)
+
+        player = np.empty(len(records), dtype=object)
+        player[:] = columns[1]
+        times = [
+            np.fromiter((MISSING if value is None else value for value in column), dtype=np.int32, count=len(records))
+            for column in columns[2:]
+        ]
+        return cls(columns[0], player, *times, personal=personal)
+
+    @classmethod
+    def from_frame(cls, df, personal=None):
+        player = np.empty(len(df), dtype=object)
+        player[:] = df["player"].tolist()
+        times = [
+            pd.to_numeric(df[column]).fillna(MISSING).to_numpy(dtype=np.int32)
+            for column in TIME_COLUMNS
+        ]
+        if personal is None and "personal" in df:
+            personal = df["personal"].to_numpy(dtype=bool)
+        return cls(df["event_id"].to_numpy(dtype=np.int32), player, *times, personal=personal)
+
+    def is_missing(self, column):
+        return getattr(self, column) == MISSING
+
+    def seconds(self, column):
+        """Float copy of a time column with NaN for missing times."""
+        values = getattr(self, column).astype(float)
+        values[self.is_missing(column)] = np.nan
+        return values
+
+    def to_pandas(self):
+        """DataFrame view on the columns, missing times become <NA>.
+
+        The value buffers are shared with the table, only the masks of the
+        nullable time columns are allocated.
+        """
+        columns = {"event_id": self.event_id, "player": self.player}
+        for column in TIME_COLUMNS:
+            values = getattr(self, column)
+            columns[column] = pd.arrays.IntegerArray(values, values == MISSING)
+        return pd.DataFrame(columns, copy=False)
+
+
+def as_penalty_table(penalty_times):
+    if isinstance(penalty_times, PenaltyTable):
+        return penalty_times
+    return PenaltyTable.from_frame(penalty_times)
+
+
+def _builtin(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+def penalty_rows(tables):
+    """Rows of the penalty tables by team, keyed by ``event_id:occurrence``.
+
+    Major penalties have two rows with the same ``event_id``, the occurrence
+    keeps their keys apart.
+    """
+    rows = {}
+    for team, table in tables.items():
+        occurrences = {}
+        team_rows = rows[team] = {}
+        missing = {column: table.is_missing(column) for column in TIME_COLUMNS}
+        for i in range(len(table)):
+            event_id = int(table.event_id[i])
+            occurrences[event_id] = occurrences.get(event_id, -1) + 1
+            row = {"event_id": event_id, "player": _builtin(table.player[i])}
+            for column in TIME_COLUMNS:
+                row[column] = None if missing[column][i] else int(getattr(table, column)[i])
+            team_rows[f"{event_id}:{occurrences[event_id]}"] = row
+    return rows
+
+
+def diff_rows(old, new):
+    """Changed and removed rows between two results of :func:`penalty_rows`."""
+    changed = {}
+    removed = {}
+    for team in old.keys() | new.keys():
+        old_rows = old.get(team, {})
+        new_rows = new.get(team, {})
+        team_changed = {key: row for key, row in new_rows.items() if old_rows.get(key) != row}
+        team_removed = [key for key in old_rows if key not in new_rows]
+        if team_changed:
+            changed[team] = team_changed
+        if team_removed:
+            removed[team] = team_removed
+    return {"changed": changed, "removed": removed}
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from dataclasses import field
+from functools import cached_property
+
+from floorball_penalty_timekeeping.utils import MINIMUM_NUM_PLAYERS
+from floorball_penalty_timekeeping.utils import NUM_PLAYERS
+from floorball_penalty_timekeeping.utils import RINK
+
+MATCH_DURATION = 3 * 20 * 60
+MINOR_DURATION = 120
+PERSONAL_DURATION = 600
+
+
+@dataclass(frozen=True)
+class EventRule:
+    """Meaning of one event code.
+
+    A penalty puts ``bench_penalties`` penalties of ``bench_duration``
+    seconds on the bench. A personal penalty is served by the player
+    in addition, a replacement serves the bench penalties. Personal
+    penalties without ``personal_duration`` last until the end of the match.
+    """
+
+    display: str
+    bench_penalties: int = 0
+    bench_duration: int = MINOR_DURATION
+    personal: bool = False
+    personal_duration: int | None = None
+    terminates_penalty: bool = False
+
+
+class CompiledRules:
+    """Lookup tables of a :class:`RuleSet` indexed by event code."""
+
+    __slots__ = (
+        "max_running", "penalty_events", "terminating_events", "bench_penalties",
+        "bench_durations", "personal", "personal_durations",
+    )
+
+    def __init__(self, events, max_running):
+        size = max(events) + 1
+        rules = [events.get(code, EventRule("")) for code in range(size)]
+        self.max_running = max_running
+        self.penalty_events = frozenset(code for code, rule in events.items() if rule.bench_penalties > 0)
+        self.terminating_events = frozenset(code for code, rule in events.items() if rule.terminates_penalty)
+        self.bench_penalties = tuple(rule.bench_penalties for rule in rules)
+        self.bench_durations = tuple(rule.bench_duration for rule in rules)
+        self.personal = tuple(rule.personal for rule in rules)
+        self.personal_durations = tuple(rule.personal_duration if rule.personal else None for rule in rules)
+
+    def personal_duration(self, event):
+        """Duration of a personal penalty, ``None`` if ``event`` has none that ends by time."""
+        if 0 <= event < len(self.personal_durations):
+            return self.personal_durations[event]
+        return None
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """Event codes and limits the timekeeping follows.
+
+    The rule set is compiled once into the lookup tables of
+    :class:`CompiledRules`, which both engines dispatch through.
+    """
+
+    events: dict = field(default_factory=dict)
+    max_running: int = 2
+    rink: str = RINK
+    match_duration: int = MATCH_DURATION
+
+    def __post_init__(self):
+        for code, rule in self.events.items():
+            if code < 0:
+                raise ValueError(f"Event codes must not be negative, got {code}.")
+            if rule.personal and rule.bench_penalties < 1:
+                raise ValueError(f"Personal penalty {code} must put a penalty on the bench.")
+        if self.max_running < 1:
+            raise ValueError("At least one penalty must be able to run.")
+        if self.match_duration < 1:
+            raise ValueError("The match must last at least one second.")
+
+    @cached_property
+    def compiled(self):
+        return CompiledRules(self.events, self.max_running)
+
+    @property
+    def num_players(self):
+        return NUM_PLAYERS[self.rink]
+
+    @property
+    def minimum_num_players(self):
+        return MINIMUM_NUM_PLAYERS[self.rink]
+
+    def display(self, event):
+        return self.events[event].display
+
+
+DEFAULT_RULES = RuleSet({
+    0: EventRule("goal", terminates_penalty=True),
+    1: EventRule("goal by penalty shot"),
+    2: EventRule("minor penalty (2')", bench_penalties=1),
+    4: EventRule("major penalty (2'+2')", bench_penalties=2),
+    3: EventRule("personal penalty (10')", bench_penalties=1, personal=True, personal_duration=PERSONAL_DURATION),
+    5: EventRule("personal penalty (match penalty)", bench_penalties=2, personal=True),
+})
+
+
+def compiled_rules(rules=None):
+    return (DEFAULT_RULES if rules is None else rules).compiled
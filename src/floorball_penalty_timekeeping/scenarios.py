@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+from dataclasses import field
+
+import pandas as pd
+
+from floorball_penalty_timekeeping.results import PERSONAL_EVENT_OFFSET
+from floorball_penalty_timekeeping.results import penalty_rows
+from floorball_penalty_timekeeping.session import TimekeepingSession
+from floorball_penalty_timekeeping.session import normalize_event
+
+DIFF_COLUMNS = ["scenario", "team", "event_id", "player", "base_end", "time_end", "difference"]
+
+
+@dataclass(frozen=True)
+class Shift:
+    """Move the event at ``position`` of the base events by ``seconds``."""
+
+    position: int
+    seconds: int
+
+    def apply(self, variant):
+        event = _find(variant, self.position)
+        second = event["minutes"] * 60 + event["seconds"] + self.seconds
+        if second < 0:
+            raise ValueError(f"Event {self.position} can not be shifted before the start of the match.")
+        _replace(variant, self.position, {**event, "minutes": second // 60, "seconds": second % 60})
+
+
+@dataclass(frozen=True)
+class Change:
+    """Change fields of the event at ``position``, e.g. ``Change(3, {"event": 4})``."""
+
+    position: int
+    changes: dict = field(default_factory=dict)
+
+    def apply(self, variant):
+        _replace(variant, self.position, {**_find(variant, self.position), **self.changes})
+
+
+@dataclass(frozen=True)
+class Drop:
+    position: int
+
+    def apply(self, variant):
+        _find(variant, self.position)
+        variant[:] = [(origin, event) for origin, event in variant if origin != self.position]
+
+
+@dataclass(frozen=True)
+class Add:
+    """Add an event after the base events, it has no position in them."""
+
+    event: dict
+
+    def apply(self, variant):
+        variant.append((None, normalize_event(self.event)))
+
+
+@dataclass
+class Variant:
+    name: object
+    session: TimekeepingSession
+    # position in the base events of every event, None for added events
+    origin: list
+    replayed: int
+
+
+class ScenarioEvaluator:
+    """What-if evaluation of many variants of one match.
+
+    The base match is simulated once. Every variant forks the base session,
+    so it restores the checkpoint before its earliest changed event and only
+    replays the events after it, the common prefix is never simulated again.
+    Positions in perturbations refer to the input order of the base events.
+    """
+
+    def __init__(self, events, rules=None):
+        self.base = TimekeepingSession(events, rules)
+        self.base_end_times = _end_times(self.base.penalty_tables(), range(len(self.base)))
+
+    def variant(self, perturbations, name=None):
+        if not isinstance(perturbations, (list, tuple)):
+            perturbations = [perturbations]
+        variant = list(enumerate(self.base.events))
+        for perturbation in perturbations:
+            perturbation.apply(variant)
+
+        session = self.base.fork()
+        replayed = session.replace_events([event for _, event in variant])
+        return Variant(name, session, [origin for origin, _ in variant], replayed)
+
+    def evaluate(self, scenarios):
+        """Diff table of the penalty end times of every scenario against the base match.
+
+        ``scenarios`` maps names to a perturbation or a list of them, a list
+        of scenarios is named by position. Only penalties whose end time
+        differs, that were added or that were removed are listed, missing
+        times are <NA>. ``event_id`` refers to the base events and is <NA>
+        for penalties of added events.
+        """
+        if not isinstance(scenarios, dict):
+            scenarios = dict(enumerate(scenarios))
+
+        rows = []
+        for name, perturbations in scenarios.items():
+            variant = self.variant(perturbations, name)
+            end_times = _end_times(variant.session.penalty_tables(), variant.origin)
+            for key in list(self.base_end_times) + [key for key in end_times if key not in self.base_end_times]:
+                base_row = self.base_end_times.get(key)
+                row = end_times.get(key)
+                base_end = None if base_row is None else base_row["time_end"]
+                time_end = None if row is None else row["time_end"]
+                if base_row is not None and row is not None and base_end == time_end:
+                    continue
+                team, event_id, _ = key
+                rows.append([
+                    name,
+                    team,
+                    event_id,
+                    (base_row if row is None else row)["player"],
+                    base_end,
+                    time_end,
+                    None if base_end is None or time_end is None else time_end - base_end,
+                ])
+
+        table = pd.DataFrame(rows, columns=DIFF_COLUMNS, dtype=object)
+        for column in ["event_id", "base_end", "time_end", "difference"]:
+            table[column] = table[column].astype("Int64")
+        return table
+
+
+def _find(variant, position):
+    for origin, event in variant:
+        if origin == position:
+            return event
+    raise IndexError(f"There is no event at position {position} of the base events.")
+
+
+def _replace(variant, position, event):
+    variant[:] = [(origin, event if origin == position else other) for origin, other in variant]
+
+
+def _end_times(tables, origin):
+    """Penalty rows by ``(team, event_id, occurrence)`` with the event ids of the base events."""
+    origin = list(origin)
+    end_times = {}
+    for team, rows in penalty_rows(tables).items():
+        # the rows are in the order of the table
+        for personal, (key, row) in zip(tables[team].personal, rows.items()):
+            event_id = row["event_id"]
+            offset = PERSONAL_EVENT_OFFSET if personal else 0
+            base_id = origin[event_id - offset]
+            occurrence = key.split(":")[1]
+            if base_id is None:
+                # added events have no base event id, keep them apart by their own
+                end_times[team, None, f"{event_id}:{occurrence}"] = row
+            else:
+                end_times[team, base_id + offset, occurrence] = row
+    return end_times
@@ -0,0 +1,259 @@
+import asyncio
+import json
+from urllib.parse import unquote
+
+from floorball_penalty_timekeeping.engine import END_OF_MATCH
+from floorball_penalty_timekeeping.results import diff_rows
+from floorball_penalty_timekeeping.results import penalty_rows
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.session import TimekeepingSession
+from floorball_penalty_timekeeping.session import normalize_event
+from floorball_penalty_timekeeping.validation import errors
+from floorball_penalty_timekeeping.validation import validate_events
+from floorball_penalty_timekeeping.wal import DurableSession
+from floorball_penalty_timekeeping.wal import EventLog
+
+EVENT_FIELDS = ["team", "player", "event", "minutes", "seconds"]
+MAX_BODY_SIZE = 1 << 20
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MatchHub:
+    """Timekeeping sessions of all matches served by one process.
+
+    Every change of a match is pushed to the queues of its subscribers as
+    the rows that changed or were removed. With a ``directory`` the events
+    are logged to it and the matches found there are recovered.
+    """
+
+    def __init__(self, directory=None, rules=None):
+        self.directory = directory
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.sessions = {}
+        self._rows = {}
+        self._subscribers = {}
+        if directory is not None:
+            for name in EventLog.names(directory):
+                self.sessions[name] = DurableSession(directory, name, rules=self.rules)
+                self._rows[name] = penalty_rows(self.sessions[name].penalty_tables())
+
+    def snapshot(self, name):
+        if name not in self.sessions:
+            raise HTTPError(404, f"Unknown match {name!r}.")
+        return {"match": name, "events": len(self.sessions[name]), "penalties": self._rows[name]}
+
+    def append(self, name, events):
+        if isinstance(events, dict):
+            events = [events]
+        if not isinstance(events, list):
+            raise HTTPError(400, "Send an event or a list of events.")
+        events = [_validate_event(event, self.rules) for event in events]
+        existing = self.sessions[name].events if name in self.sessions else []
+        # matches recovered from a log may be inconsistent already, only reject new errors
+        new_errors = [
+            diagnostic for diagnostic in errors(validate_events(existing + events, self.rules))
+            if diagnostic.position >= len(existing)
+        ]
+        if new_errors:
+            raise HTTPError(400, " ".join(diagnostic.message for diagnostic in new_errors))
+
+        if name not in self.sessions:
+            if self.directory is None:
+                self.sessions[name] = TimekeepingSession(rules=self.rules)
+            else:
+                self.sessions[name] = DurableSession(self.directory, name, rules=self.rules)
+            self._rows[name] = {}
+        session = self.sessions[name]
+        for event in events:
+            session.append(event)
+        return self._publish(name)
+
+    def pop_last(self, name):
+        if len(self.sessions.get(name, ())) == 0:
+            raise HTTPError(404, f"Match {name!r} has no events.")
+        self.sessions[name].pop_last()
+        return self._publish(name)
+
+    def subscribe(self, name):
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(name, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, name, queue):
+        self._subscribers.get(name, set()).discard(queue)
+
+    def _publish(self, name):
+        rows = penalty_rows(self.sessions[name].penalty_tables())
+        changes = {"match": name, **diff_rows(self._rows[name], rows)}
+        self._rows[name] = rows
+        if changes["changed"] or changes["removed"]:
+            for queue in self._subscribers.get(name, ()):
+                queue.put_nowait(changes)
+        return changes
+
+
+def _validate_event(event, rules):
+    """The fields of a posted event, unknown fields are dropped."""
+    if not isinstance(event, dict):
+        raise HTTPError(400, "Events must be JSON objects.")
+    event = normalize_event(event)
+    missing = [field for field in EVENT_FIELDS if field not in event]
+    if missing:
+        raise HTTPError(400, f"Event is missing {', '.join(missing)}.")
+    if not all(type(event[field]) in (str, int) for field in ["team", "player"]):
+        raise HTTPError(400, "Team and player must be strings or integers.")
+    # JSON booleans are ints in Python
+    if not all(type(event[field]) is int for field in ["event", "minutes", "seconds"]):
+        raise HTTPError(400, "Event, minutes and seconds must be integers.")
+    if event["event"] not in rules.events:
+        raise HTTPError(400, f"Unknown event {event['event']!r}.")
+    if not (0 <= event["seconds"] < 60 and 0 <= event["minutes"] * 60 + event["seconds"] < END_OF_MATCH):
+        raise HTTPError(400, "Minutes or seconds are out of range.")
+    return {field: event[field] for field in EVENT_FIELDS}
+
+
+class TimekeepingServer:
+    """HTTP server for live timekeeping of many matches.
+
+    ``POST /matches/<name>/events`` appends one event or a list of events,
+    ``DELETE /matches/<name>/events/last`` removes the last event,
+    ``GET /matches`` and ``GET /matches/<name>`` return the current state and
+    ``GET /matches/<name>/stream`` pushes the changed rows as server-sent
+    events.
+    """
+
+    def __init__(self, hub=None):
+        self.hub = hub or MatchHub()
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8000):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        try:
+            method, path, body = await _read_request(reader)
+            parts = [unquote(part) for part in path.strip("/").split("/")]
+            if method == "GET" and len(parts) == 3 and parts[0] == "matches" and parts[2] == "stream":
+                await self.stream(parts[1], reader, writer)
+            else:
+                _write_json(writer, 200, self.route(method, parts, body))
+        except HTTPError as e:
+            _write_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            # answer instead of dropping the connection
+            _write_json(writer, 500, {"error": "Internal server error."})
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def route(self, method, parts, body):
+        if parts[0] != "matches":
+            raise HTTPError(404, "Not found.")
+        if len(parts) == 1 and method == "GET":
+            return {"matches": list(self.hub.sessions)}
+        if len(parts) == 2 and method == "GET":
+            return self.hub.snapshot(parts[1])
+        if len(parts) == 3 and parts[2] == "events" and method == "POST":
+            try:
+                events = json.loads(body)
+            except ValueError:
+                raise HTTPError(400, "Body is not valid JSON.")
+            return self.hub.append(parts[1], events)
+        if len(parts) == 4 and parts[2:] == ["events", "last"] and method == "DELETE":
+            return self.hub.pop_last(parts[1])
+        raise HTTPError(405 if len(parts) <= 4 else 404, f"{method} /{'/'.join(parts)} is not supported.")
+
+    async def stream(self, name, reader, writer):
+        snapshot = self.hub.snapshot(name)
+        queue = self.hub.subscribe(name)
+        closed = changes = None
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            writer.write(_server_sent_event("snapshot", snapshot))
+            await writer.drain()
+
+            # the client closing the connection ends the stream
+            closed = asyncio.ensure_future(reader.read())
+            while True:
+                changes = asyncio.ensure_future(queue.get())
+                await asyncio.wait({changes, closed}, return_when=asyncio.FIRST_COMPLETED)
+                if closed.done():
+                    break
+                writer.write(_server_sent_event("changes", changes.result()))
+                await writer.drain()
+        finally:
+            # also when writing to a client that went away failed
+            for future in [closed, changes]:
+                if future is not None:
+                    future.cancel()
+            self.hub.unsubscribe(name, queue)
+
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) != 3:
+        raise HTTPError(400, "Malformed request line.")
+    method, path, _ = request_line
+
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Malformed Content-Length.")
+    if length < 0:
+        raise HTTPError(400, "Malformed Content-Length.")
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(400, "Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?")[0], body
+
+
+def _write_json(writer, status, data):
+    body = json.dumps(data).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode() + body
+    )
+
+
+def _server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def serve(host="127.0.0.1", port=8000, directory=None, rules=None):
+    server = TimekeepingServer(MatchHub(directory, rules))
+    await server.start(host, port)
+    async with server.server:
+        await server.server.serve_forever()
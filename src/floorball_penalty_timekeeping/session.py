@@ -0,0 +1,243 @@
+import threading
+from dataclasses import asdict
+from dataclasses import is_dataclass
+
+import pandas as pd
+
+from floorball_penalty_timekeeping.cache import events_key
+from floorball_penalty_timekeeping.engine import MatchState
+from floorball_penalty_timekeeping.results import diff_rows
+from floorball_penalty_timekeeping.results import penalty_rows
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+
+PLACEHOLDER_TEAM = "EasterEgg"
+PREPARED_COLUMNS = ["index", "team", "player", "event", "seconds"]
+
+
+def _sort_key(event):
+    return event["minutes"], event["seconds"], event["event"]
+
+
+def normalize_event(event):
+    if is_dataclass(event):
+        event = asdict(event)
+    return {key.lower(): value for key, value in event.items()}
+
+
+def _records(events):
+    """Chronological ``(event_id, team, player, event, seconds)`` records like ``prepare_events``."""
+    order = sorted(range(len(events)), key=lambda index: _sort_key(events[index]))
+    return [
+        (
+            index,
+            events[index]["team"],
+            events[index]["player"],
+            events[index]["event"],
+            events[index]["minutes"] * 60 + events[index]["seconds"],
+        )
+        for index in order
+    ]
+
+
+def _teams(records):
+    teams = list(dict.fromkeys(record[1] for record in records))
+    if len(teams) == 1:
+        teams += [PLACEHOLDER_TEAM]
+    return teams
+
+
+def _first_difference(old, new):
+    for position, (old_record, new_record) in enumerate(zip(old, new)):
+        if old_record != new_record:
+            return position
+    return min(len(old), len(new))
+
+
+class TimekeepingSession:
+    """Timekeeping of a match whose events are entered and corrected live.
+
+    The penalty state before every event, in chronological order, is kept as
+    a checkpoint. Any change of the events restores the checkpoint before the
+    earliest affected event and only replays the events after it, so that
+    appending in chronological order or removing the last event does not
+    recompute anything else.
+    """
+
+    def __init__(self, events=(), rules=None):
+        self.rules = DEFAULT_RULES if rules is None else rules
+        # held by threads that share the session, e.g. browser sessions of the app
+        self.lock = threading.RLock()
+        self.events = []
+        self._records = []
+        self._checkpoints = []
+        self._match = None
+        self._clear_results()
+        for event in events:
+            self.append(event)
+
+    def __len__(self):
+        return len(self.events)
+
+    def _clear_results(self):
+        self._prepared_events = None
+        self._finished_match = None
+        self._penalty_times_by_team = None
+        self._penalty_tables = None
+
+    def append(self, event):
+        self._update(self.events + [normalize_event(event)])
+
+    def pop_last(self):
+        event = self.events[-1]
+        self._update(self.events[:-1])
+        return event
+
+    def insert(self, event, position=None):
+        """Insert an event at ``position`` of the event log, the end by default.
+
+        Like :meth:`edit` and :meth:`delete` this returns the replay report.
+        """
+        position = len(self.events) if position is None else position
+        events = self.events.copy()
+        events.insert(position, normalize_event(event))
+        return self._update_with_report(events)
+
+    def edit(self, position, replacement=None, **changes):
+        """Replace the event at ``position`` or change some of its fields.
+
+        Returns a report with the penalty rows that ``changed`` or were
+        ``removed`` (see :func:`results.diff_rows`) and the number of
+        ``replayed`` events.
+        """
+        events = self.events.copy()
+        event = self.events[position] if replacement is None else normalize_event(replacement)
+        events[position] = {**event, **changes}
+        return self._update_with_report(events)
+
+    def delete(self, position):
+        events = self.events.copy()
+        del events[position]
+        return self._update_with_report(events)
+
+    def replace_events(self, events):
+        """Replace all events, returns the number of replayed events."""
+        return self._update([normalize_event(event) for event in events])
+
+    def fork(self):
+        """Independent session with the same events that shares the checkpoints.
+
+        Checkpoints are copied before they are replayed from, only the
+        current state is copied here.
+        """
+        other = TimekeepingSession(rules=self.rules)
+        other.events = self.events.copy()
+        other._records = self._records
+        other._checkpoints = self._checkpoints
+        other._match = None if self._match is None else self._match.copy()
+        return other
+
+    def _update_with_report(self, events):
+        old_rows = penalty_rows(self.penalty_tables())
+        replayed = self._update(events)
+        return {**diff_rows(old_rows, penalty_rows(self.penalty_tables())), "replayed": replayed}
+
+    def _replay_start(self, records, teams):
+        if self._match is None or teams[0] != self._match.teams[0]:
+            return 0
+
+        start = _first_difference(self._records, records)
+        # personal penalties look up their event code by event_id in the
+        # chronological codes, a changed code there changes the earlier state
+        personal = self._match.rules.personal
+        old_codes = self._match.event_codes
+        new_codes = [record[3] for record in records]
+        for position, (event_id, _, _, event, _) in enumerate(records[:start]):
+            if personal[event] and (
+                event_id >= len(new_codes) or old_codes[event_id] != new_codes[event_id]
+            ):
+                return position
+        return start
+
+    def state(self):
+        """Events and match state to be passed to :meth:`restore` later."""
+        return self.events, self._match
+
+    def restore(self, events, match):
+        """Continue from the state ``match`` after all ``events``, e.g. from a snapshot.
+
+        Changes before the end of the restored events replay all events, as
+        there are no checkpoints for them.
+        """
+        self.events = list(events)
+        self._records = _records(self.events)
+        self._checkpoints = [None] * len(self._records)
+        self._match = match
+        self._clear_results()
+
+    def _update(self, events):
+        records = _records(events)
+        teams = _teams(records)
+        start = self._replay_start(records, teams) if records else 0
+        if 0 < start < len(self._records) and self._checkpoints[start] is None:
+            start = 0
+
+        if not records:
+            match = None
+        elif start == 0:
+            match = MatchState(teams, [], rules=self.rules)
+        elif start == len(self._records):
+            match = self._match
+        else:
+            match = self._checkpoints[start].copy()
+
+        checkpoints = self._checkpoints[:start]
+        if match is not None:
+            if match.teams != teams:
+                # only the second team can change, it had no events so far
+                match.team_states = dict(zip(teams, match.team_states.values()))
+                match.teams = teams
+            match.event_codes = [record[3] for record in records]
+            for record in records[start:]:
+                checkpoints.append(match.copy())
+                match.process_event(*record)
+
+        self.events = events
+        self._records = records
+        self._checkpoints = checkpoints
+        self._match = match
+        self._clear_results()
+        return len(records) - start
+
+    def content_key(self):
+        return events_key(self.prepared_events(), rules=self.rules)
+
+    def prepared_events(self):
+        if self._prepared_events is None:
+            # the records already are the prepared events in chronological order
+            self._prepared_events = pd.DataFrame(self._records, columns=PREPARED_COLUMNS)
+        return self._prepared_events
+
+    def _finish(self):
+        if self._finished_match is None:
+            self._finished_match = self._match.copy()
+            self._finished_match.finish()
+        return self._finished_match
+
+    def penalty_times_by_team(self):
+        if self._match is None:
+            return {}
+        if self._penalty_times_by_team is None:
+            self._penalty_times_by_team = self._finish().to_frames()
+        return self._penalty_times_by_team
+
+    def penalty_tables(self):
+        if self._match is None:
+            return {}
+        if self._penalty_tables is None:
+            self._penalty_tables = self._finish().to_tables()
+        return self._penalty_tables
+
+    def pauses_by_team(self):
+        if self._match is None:
+            return {}
+        return self._finish().pauses_frames()
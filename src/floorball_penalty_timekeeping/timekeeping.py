@@ -1,7 +1,17 @@
-import pandas as pd
 from copy import deepcopy
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
 
-from floorball_penalty_timekeeping.utils import PENALTY_EVENTS
+from floorball_penalty_timekeeping.engine import timekeeping_python
+from floorball_penalty_timekeeping.intervals import pauses_frame
+from floorball_penalty_timekeeping.intervals import personal_penalty_times
+from floorball_penalty_timekeeping.intervals import to_time
+from floorball_penalty_timekeeping.profiling import active_profiler
+from floorball_penalty_timekeeping.results import PERSONAL_EVENT_OFFSET
+from floorball_penalty_timekeeping.results import PenaltyTable
+from floorball_penalty_timekeeping.rules import compiled_rules
 
 
 def mask_running_penalties(penalty_times):
@@ -9,7 +19,7 @@ def mask_running_penalties(penalty_times):
 
 
 def mask_penalty_ended_by_time(current_time, penalty_times):
-    return current_time - 120 >= penalty_times["time_start"]
+    return current_time - penalty_times["duration"] >= penalty_times["time_start"]
 
 
 def mask_waiting_penalties(current_time, penalty_times):
@@ -34,7 +44,17 @@ def get_number_running_penalties(penalty_times):
     return sum(mask_running_penalties(penalty_times))
 
 
-def timekeeping(ordered_events):
+def timekeeping(ordered_events, engine="python", profiler=None, return_pauses=False, as_tables=False, rules=None):
+    if profiler is None:
+        profiler = active_profiler()
+
+    if engine == "python":
+        return timekeeping_python(ordered_events, profiler, return_pauses, as_tables, rules)
+    elif engine != "pandas":
+        raise ValueError(f"Unknown timekeeping engine '{engine}', use 'python' or 'pandas'.")
+
+    rules = compiled_rules(rules)
+
     teams = ordered_events["team"].unique().tolist()
 
     if len(teams) == 1:
@@ -48,6 +68,10 @@ def timekeeping(ordered_events):
         for team in teams
     }
     personal_penalties_by_team = deepcopy(penalty_times_by_team)
+    # duration of the bench penalties, dropped from the result
+    for penalty_times in penalty_times_by_team.values():
+        penalty_times["duration"] = pd.Series(dtype=object)
+    pauses_by_team = {team: {} for team in teams}
 
     for _, event in ordered_events.iterrows():
         current_time = event["seconds"]
@@ -56,106 +80,73 @@ def timekeeping(ordered_events):
             penalty_times = penalty_times_by_team[team]
             personal_penalties = personal_penalties_by_team[team]
 
-            mask_waiting = mask_waiting_penalties(current_time, penalty_times)
-            mask_running = mask_running_penalties(penalty_times)
-            mask_to_be_ended = mask_penalty_ended_by_time(current_time, penalty_times)
-            mask = (mask_running & mask_to_be_ended) | mask_waiting
-
-            while mask.any():
-                # end running penalties
-                penalty_times.loc[mask_running & mask_to_be_ended, "time_end"] = penalty_times.loc[mask_running & mask_to_be_ended, "time_start"] + 120
-                num_running_penalties_per_team = get_number_running_penalties(penalty_times)
+            if profiler is not None:
+                start = perf_counter()
+                iterations = 0
 
-                if num_running_penalties_per_team == 2:
+            while True:
+                mask_ended = mask_running_penalties(penalty_times) & mask_penalty_ended_by_time(current_time, penalty_times)
+                if not mask_ended.any():
                     break
-
-                available_to_start = penalty_times.loc[mask_available_to_start_penalties(current_time, penalty_times)]
-                available_to_start = available_to_start.drop_duplicates(subset="player", keep="first")
-
-                if len(available_to_start) == 0:
-                    break
-
-                if num_running_penalties_per_team == 1 or len(available_to_start) == 1:
-                    end_times = penalty_times.loc[penalty_times["time_end"].notna(), "time_end"].sort_values()
-
-                    next_index = available_to_start.index.min()
-
-                    next_player = penalty_times.loc[next_index, "player"]
-                    last_time_of_player = penalty_times.loc[penalty_times["player"] == next_player, "time_end"].max()
-                    time_start = min(last_time_of_player, end_times.iloc[-1])
-                    penalty_times.loc[next_index, "time_start"] = time_start
-
-                else:
-                    end_times = penalty_times.loc[penalty_times["time_end"].notna(), "time_end"].sort_values()
-
-                    next_index = available_to_start.index.min()
-                    next_player = penalty_times.loc[next_index, "player"]
-                    last_time_of_player = penalty_times.loc[penalty_times["player"] == next_player, "time_end"].max()
-                    time_start = max(last_time_of_player, end_times.iloc[-2])
-                    penalty_times.loc[next_index, "time_start"] = time_start
-
-                    if time_start != end_times.iloc[-2]:
-                        time_start = end_times.iloc[-2]
-                    else:
-                        time_start = end_times.iloc[-1]
-
-                    available_to_start = penalty_times.loc[mask_available_to_start_penalties(current_time, penalty_times)]
-                    next_index = available_to_start.index.min()
-                    penalty_times.loc[next_index, "time_start"] = time_start
-
-                # check if there are still penalties running that have been terminated in the meantime
-                mask_available_to_start = mask_available_to_start_penalties(current_time, penalty_times)
-                mask_running = mask_running_penalties(penalty_times)
-                mask_to_be_ended = mask_penalty_ended_by_time(current_time, penalty_times)
-                mask = (mask_running & mask_to_be_ended) | mask_available_to_start
+                if profiler is not None:
+                    iterations += 1
+                # end the penalty that is due first, the slot it frees starts the next penalties
+                due = (penalty_times.loc[mask_ended, "time_start"] + penalty_times.loc[mask_ended, "duration"]).astype(float)
+                ended_index = due.idxmin()
+                time_end = penalty_times.loc[ended_index, "time_start"] + penalty_times.loc[ended_index, "duration"]
+                penalty_times.loc[ended_index, "time_end"] = time_end
+
+                while get_number_running_penalties(penalty_times) < rules.max_running:
+                    mask_available_to_start = mask_available_to_start_penalties(current_time, penalty_times)
+                    if not mask_available_to_start.any():
+                        break
+                    penalty_times.loc[penalty_times.loc[mask_available_to_start].index.min(), "time_start"] = time_end
+
+            if profiler is not None:
+                profiler.record(
+                    "start_penalties", team, event["index"], current_time, start, perf_counter() - start,
+                    iterations, len(penalty_times), len(personal_penalties),
+                )
+                start = perf_counter()
 
             # start, pause or end personal penalty
             mask = personal_penalties["time_end"].isna()
             not_ended_personal_penalties = personal_penalties.loc[mask]
             for index, row in not_ended_personal_penalties.iterrows():
-                if ordered_events.loc[row["event_id"], "event"] == 3:
+                duration = rules.personal_duration(ordered_events.loc[row["event_id"], "event"])
+                if duration is not None:
                     mask = penalty_times["player"] == f"Bgl. {row['player']}"
-                    other_penalties_by_player = penalty_times.loc[mask]
-
-                    not_on_bench = []
-                    for idx, penalty in other_penalties_by_player.iterrows():
-                        if idx == other_penalties_by_player.index[0]:
-                            not_on_bench += [penalty["time_end"]]
-                        else:
-                            if penalty["to_bench"] <= not_on_bench[-1]:
-                                not_on_bench[-1] = penalty["time_end"]
-                            else:
-                                not_on_bench += penalty[["to_bench", "time_end"]].tolist()
-
-                    for i, time in enumerate(not_on_bench):
-                        if i == 0:
-                            personal_penalties.loc[index, "time_start"] = time
-                        elif i % 2 == 0:
-                            personal_penalties.loc[index, f"time_start_pause_{i}"] = time
-                        else:
-                            personal_penalties.loc[index, f"time_end_pause_{i}"] = time
-
-                    not_on_bench += [current_time]
-                    total_time_on_bench = 0
-                    if len(not_on_bench) > 2:
-                        total_time_on_bench = sum([end - start for start, end in zip(not_on_bench[1:-1:2], not_on_bench[2::2])])
-
-                    total_time_not_on_bench = sum([end - start for start, end in zip(not_on_bench[::2], not_on_bench[1::2])])
-                    if total_time_not_on_bench >= 600:
-                        personal_penalties.loc[index, "time_end"] = personal_penalties.loc[index, "time_start"] + total_time_on_bench + 600
-
-            personal_penalties
-
-        if event["event"] in PENALTY_EVENTS:
+                    time_start, pause_starts, pause_ends, time_on_bench = personal_penalty_times(
+                        penalty_times.loc[mask, "to_bench"], penalty_times.loc[mask, "time_end"]
+                    )
+                    personal_penalties.loc[index, "time_start"] = to_time(time_start, np.nan)
+                    pauses_by_team[team][index] = [
+                        (to_time(start), to_time(end)) for start, end in zip(pause_starts, pause_ends)
+                    ]
+
+                    if current_time - time_start - time_on_bench >= duration:
+                        personal_penalties.loc[index, "time_end"] = to_time(time_start + time_on_bench + duration)
+
+            if profiler is not None:
+                profiler.record(
+                    "personal_penalties", team, event["index"], current_time, start, perf_counter() - start,
+                    len(not_ended_personal_penalties), len(penalty_times), len(personal_penalties),
+                )
+
+        if event["event"] in rules.penalty_events:
+            if profiler is not None:
+                start = perf_counter()
+
             penalty_times = penalty_times_by_team[event["team"]]
             personal_penalties = personal_penalties_by_team[event["team"]]
 
             next_index = penalty_times.index.max() + 1 if not penalty_times.empty else 0
             penalty_times.loc[next_index, "event_id"] = event["index"]
             penalty_times.loc[next_index, "to_bench"] = current_time
+            penalty_times.loc[next_index, "duration"] = rules.bench_durations[event["event"]]
             player = event["player"]
 
-            if event["event"] in [3, 5]:
+            if rules.personal[event["event"]]:
                 next_pp_index = personal_penalties.index.max() + 1 if not personal_penalties.empty else 0
                 personal_penalties.loc[next_pp_index, "event_id"] = event["index"]
                 personal_penalties.loc[next_pp_index, "player"] = player
@@ -170,22 +161,32 @@ def timekeeping(ordered_events):
 
             penalty_times.loc[next_index, "player"] = player
 
-            # enter second set of 2 minute penalties for major and match penalties
-            if event["event"] in [4, 5]:
-                penalty_times.loc[next_index + 1, "event_id"] = event["index"]
-                penalty_times.loc[next_index + 1, "to_bench"] = current_time
-                penalty_times.loc[next_index + 1, "player"] = player
+            # enter further bench penalties, e.g. the second 2 minutes of major and match penalties
+            for further_index in range(next_index + 1, next_index + rules.bench_penalties[event["event"]]):
+                penalty_times.loc[further_index, "event_id"] = event["index"]
+                penalty_times.loc[further_index, "to_bench"] = current_time
+                penalty_times.loc[further_index, "duration"] = rules.bench_durations[event["event"]]
+                penalty_times.loc[further_index, "player"] = player
 
             num_running_penalties_per_team = get_number_running_penalties(penalty_times)
 
-            if num_running_penalties_per_team < 2:
+            if num_running_penalties_per_team < rules.max_running:
                 available_to_start = penalty_times.loc[mask_available_to_start_penalties(current_time, penalty_times)]
                 available_to_start = available_to_start.drop_duplicates(subset="player", keep="first")
                 if next_index in available_to_start.index:
                     penalty_times.loc[next_index, "time_start"] = current_time
 
-        if event["event"] == 0:
-            team = list(set(teams) - set(event["team"]))[0]
+            if profiler is not None:
+                profiler.record(
+                    "add_penalty", event["team"], event["index"], current_time, start, perf_counter() - start,
+                    0, len(penalty_times), len(personal_penalties),
+                )
+
+        if event["event"] in rules.terminating_events:
+            if profiler is not None:
+                start = perf_counter()
+
+            team = next(other for other in teams if other != event["team"])
             penalty_times = penalty_times_by_team[team]
 
             num_penalties = get_number_running_penalties(penalty_times)
@@ -206,8 +207,31 @@ def timekeeping(ordered_events):
                         next_index = penalty_times.loc[available_to_start].index.min()
                         penalty_times.loc[next_index, "time_start"] = current_time
 
-    for team in teams:
-        personal_penalties_by_team[team]["event_id"] += 999
-        penalty_times_by_team[team] = pd.concat([penalty_times_by_team[team], personal_penalties_by_team[team]])
+            if profiler is not None:
+                profiler.record(
+                    "goal_termination", team, event["index"], current_time, start, perf_counter() - start,
+                    0, len(penalty_times), len(personal_penalties_by_team[team]),
+                )
 
+    for team in teams:
+        personal_penalties = personal_penalties_by_team[team]
+        personal_penalties["event_id"] += PERSONAL_EVENT_OFFSET
+        penalty_times = penalty_times_by_team[team].drop(columns="duration")
+        penalty_times_by_team[team] = pd.concat([penalty_times, personal_penalties])
+        pauses_by_team[team] = pauses_frame(
+            (personal_penalties.loc[index, "event_id"], personal_penalties.loc[index, "player"], pauses_by_team[team].get(index, []))
+            for index in personal_penalties.index
+        )
+
+    if as_tables:
+        penalty_times_by_team = {
+            team: PenaltyTable.from_frame(
+                penalty_times,
+                personal=np.arange(len(penalty_times)) >= len(penalty_times) - len(personal_penalties_by_team[team]),
+            )
+            for team, penalty_times in penalty_times_by_team.items()
+        }
+
+    if return_pauses:
+        return penalty_times_by_team, pauses_by_team
     return penalty_times_by_team
\ No newline at end of file
@@ -0,0 +1,197 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from floorball_penalty_timekeeping.results import as_penalty_table
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+
+STATUSES = ["waiting", "running", "paused"]
+INTERVAL_COLUMNS = ["team", "row", "event_id", "player", "kind", "status", "begin", "end"]
+
+
+def _time(values, missing):
+    values = np.asarray(values, dtype=float)
+    return np.where(missing, np.inf, values)
+
+
+class PenaltyTimeline:
+    """Interval index of the penalty situation of a match.
+
+    All penalties are split into intervals in which their status does not
+    change: ``waiting`` from going to the bench until the start, ``running``
+    and, for personal penalties, ``paused`` while a replacement penalty is
+    served. Queries are binary searches in the sorted begins and ends of the
+    intervals. Open ends last until the end of time. The players on the
+    court follow the rink of ``rules``.
+    """
+
+    def __init__(self, penalty_tables, pauses_by_team=None, rules=None):
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.teams = list(penalty_tables)
+        self.tables = {team: as_penalty_table(table) for team, table in penalty_tables.items()}
+        pauses_by_team = pauses_by_team or {}
+
+        intervals = []
+        for team, table in self.tables.items():
+            pauses = pauses_by_team.get(team)
+            intervals += self._team_intervals(team, table, pauses)
+        self.intervals = pd.DataFrame(intervals, columns=INTERVAL_COLUMNS)
+
+        running = self.intervals.loc[self.intervals["status"] == "running"]
+        self._running = {
+            key: (group["begin"].to_numpy(), group["end"].to_numpy())
+            for key, group in running.groupby(["team", "row"], sort=False)
+        }
+
+        begin = self.intervals["begin"].to_numpy(dtype=float)
+        self._end = self.intervals["end"].to_numpy(dtype=float)
+        self._order = np.argsort(begin, kind="stable")
+        self._begin = begin[self._order]
+
+        # sorted begins and ends by team, kind and status, the number of
+        # intervals active at a time is the difference of their ranks
+        self._counts = {}
+        for team in self.teams:
+            for kind in ["penalty", "personal"]:
+                for status in STATUSES:
+                    mask = (
+                        (self.intervals["team"] == team)
+                        & (self.intervals["kind"] == kind)
+                        & (self.intervals["status"] == status)
+                    ).to_numpy()
+                    self._counts[team, kind, status] = (np.sort(begin[mask]), np.sort(self._end[mask]))
+
+    @classmethod
+    def from_events(cls, ordered_events, engine="python", rules=None):
+        tables, pauses = timekeeping(ordered_events, engine=engine, return_pauses=True, as_tables=True, rules=rules)
+        return cls(tables, pauses, rules=rules)
+
+    @staticmethod
+    def _team_intervals(team, table, pauses):
+        intervals = []
+        to_bench = table.to_bench.astype(float)
+        time_start = _time(table.time_start, table.is_missing("time_start"))
+        time_end = _time(table.time_end, table.is_missing("time_end"))
+        for row in range(len(table)):
+            event_id = int(table.event_id[row])
+            kind = "personal" if table.personal[row] else "penalty"
+            common = [team, row, event_id, table.player[row], kind]
+            if to_bench[row] < time_start[row]:
+                intervals.append(common + ["waiting", to_bench[row], time_start[row]])
+            if np.isinf(time_start[row]):
+                continue
+
+            begin = time_start[row]
+            if kind == "personal" and pauses is not None and not pauses.empty:
+                own = pauses.loc[pauses["event_id"] == event_id]
+                for pause_start, pause_end in zip(own["time_start"], own["time_end"]):
+                    pause_end = np.inf if np.isnan(pause_end) else pause_end
+                    if pause_start > begin:
+                        intervals.append(common + ["running", begin, pause_start])
+                    intervals.append(common + ["paused", pause_start, pause_end])
+                    begin = pause_end
+            if begin < time_end[row]:
+                intervals.append(common + ["running", begin, time_end[row]])
+        return intervals
+
+    def _active(self, start, end):
+        """Rows of the intervals that begin until ``end`` and end after ``start``."""
+        candidates = self._order[:np.searchsorted(self._begin, end, side="right")]
+        return np.sort(candidates[self._end[candidates] > start])
+
+    def situation(self, time):
+        """Penalties on the bench at ``time`` with their status and remaining time."""
+        rows = self._active(time, time)
+        situation = self.intervals.iloc[rows].drop(columns=["begin"]).reset_index(drop=True)
+        situation["remaining"] = [
+            self._remaining(team, row, time)
+            for team, row in zip(situation["team"], situation["row"])
+        ]
+        return situation.drop(columns=["row", "end"])
+
+    def _remaining(self, team, row, time):
+        """Seconds of the penalty still to be served, pauses do not count."""
+        if (team, row) not in self._running:
+            return np.nan
+        begin, end = self._running[team, row]
+        if np.isinf(end).any():
+            return np.nan
+        return float(np.clip(end - np.maximum(begin, time), 0, None).sum())
+
+    def between(self, start, end):
+        """Intervals overlapping the range from ``start`` to ``end``."""
+        intervals = self.intervals.iloc[self._active(start, end)]
+        return intervals.loc[(intervals["begin"] < end) & (intervals["end"] > start)].drop(columns="row")
+
+    def state_at(self, times):
+        """Vectorized numbers of penalties by status and players on the court.
+
+        Returns per team a dict of arrays with the same length as ``times``.
+        """
+        times = np.asarray(times, dtype=float)
+        state = {}
+        for team in self.teams:
+            counts = {}
+            for kind in ["penalty", "personal"]:
+                for status in STATUSES:
+                    if kind == "penalty" and status == "paused":
+                        continue
+                    begin, end = self._counts[team, kind, status]
+                    counts[f"{kind}_{status}"] = (
+                        np.searchsorted(begin, times, side="right") - np.searchsorted(end, times, side="right")
+                    )
+            counts["on_court"] = np.maximum(
+                self.rules.num_players - counts["penalty_running"], self.rules.minimum_num_players
+            )
+            state[team] = counts
+        return state
+
+    def on_court(self, time):
+        return {team: int(counts["on_court"][0]) for team, counts in self.state_at([time]).items()}
+
+
+def court_strength(penalty_tables, rules=None, duration=None):
+    """Players on the court of every team for every second of the match.
+
+    Second ``s`` covers the time from ``s`` to ``s + 1``. ``duration``
+    defaults to the match time of ``rules`` or the latest known time of the
+    penalties, open penalties last until the end.
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    tables = {team: as_penalty_table(table) for team, table in penalty_tables.items()}
+    if duration is None:
+        known = [
+            getattr(table, column)[~table.is_missing(column)].max(initial=0)
+            for table in tables.values()
+            for column in ["to_bench", "time_start", "time_end"]
+        ]
+        duration = max([rules.match_duration] + [int(time) + 1 for time in known])
+
+    strength = {}
+    for team, table in tables.items():
+        bench = ~table.personal & ~table.is_missing("time_start")
+        starts = np.clip(table.time_start[bench], 0, duration)
+        ends = np.clip(np.where(table.is_missing("time_end")[bench], duration, table.time_end[bench]), 0, duration)
+
+        difference = np.zeros(duration + 1, dtype=np.int32)
+        np.add.at(difference, starts, -1)
+        np.add.at(difference, ends, 1)
+        on_court = rules.num_players + np.cumsum(difference[:-1])
+        strength[team] = np.maximum(on_court, rules.minimum_num_players).astype(np.int8)
+    return strength
+
+
+def save_court_strength(strength, path):
+    """Write :func:`court_strength` as compressed ``.npz`` or ``.parquet``.
+
+    Parquet needs one of the optional parquet engines of pandas (pyarrow).
+    """
+    if os.path.splitext(str(path))[1].lower() == ".parquet":
+        df = pd.DataFrame({"second": np.arange(len(next(iter(strength.values()), [])), dtype=np.int32)})
+        for team, on_court in strength.items():
+            df[str(team)] = on_court
+        df.to_parquet(path, index=False)
+    else:
+        np.savez_compressed(path, **{str(team): on_court for team, on_court in strength.items()})
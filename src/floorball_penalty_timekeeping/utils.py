@@ -1,54 +1,77 @@
 from dataclasses import dataclass
 
-ALL_EVENTS = {
-    0: {
-        "display": "goal",
-        "duration": "NaN",
-        "can_terminate_penalty": True,
-    },
-    1: {
-        "display": "goal by penalty shot",
-        "duration": "NaN",
-        "can_terminate_penalty": False,
-    },
-    2: {
-        "display": "minor penalty (2')",
-        "duration": 120,
-    },
-    4: {
-        "display": "major penalty (2'+2')",
-        "replace_by": 2,
-    },
-    3: {
-        "display": "personal penalty (10')",
-        "duration": 600,
-        "adds": 2
-    },
-    5: {
-        "display": "personal penalty (match penalty)",
-        "duration": "NaN",
-        "adds": 3
-    },
-}
-GOAL_EVENTS = {event: ALL_EVENTS[event] for event in ALL_EVENTS if event <= 1}
-PENALTY_EVENTS = {event: ALL_EVENTS[event] for event in ALL_EVENTS if event > 1}
+import numpy as np
+import pandas as pd
+
 NUM_PLAYERS = {"KF": 4, "GF": 6}
 MINIMUM_NUM_PLAYERS = {"KF": 3, "GF": 4}
 RINK = "GF"
+TWO_DIGITS = np.array([f"{number:02}" for number in range(100)], dtype=object)
 
 
 def seconds_to_mmss(seconds):
-    minutes = seconds // 60
-    seconds = seconds % 60
+    if np.isnan(seconds):
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
     return f'{minutes:02}:{seconds:02}'
 
 
+def format_mmss(seconds, missing=""):
+    """Vectorized :func:`seconds_to_mmss`, NaN become ``missing``."""
+    seconds = np.asarray(seconds, dtype=float)
+    known = ~np.isnan(seconds)
+    minutes, seconds = np.divmod(seconds[known].astype(np.int64), 60)
+    two_digits = (minutes >= 0) & (minutes < 100)
+    minutes = np.where(two_digits, TWO_DIGITS[np.clip(minutes, 0, 99)], minutes.astype(str).astype(object))
+    formatted = np.full(len(known), missing, dtype=object)
+    formatted[known] = minutes + ":" + TWO_DIGITS[seconds]
+    return formatted
+
+
+def event_order(seconds, event):
+    """Stable chronological order of events, ``None`` if they already are in order.
+
+    Sorts once by the combined key of game seconds and event code. Sorted
+    input only takes a linear validation pass.
+    """
+    seconds = np.asarray(seconds, dtype=np.int64)
+    event = np.asarray(event, dtype=np.int64)
+    if len(event) == 0:
+        return None
+    lowest = event.min()
+    key = seconds * (event.max() - lowest + 1) + (event - lowest)
+    if (key[1:] >= key[:-1]).all():
+        return None
+    return np.argsort(key, kind="stable")
+
+
+def prepare_event_arrays(columns, index=None):
+    """Array version of :func:`prepare_events` without intermediate frames.
+
+    ``columns`` maps the lower case column names to equally long arrays.
+    Returns the columns in chronological order after an ``index`` column
+    with ``index`` or the input positions, ``seconds`` holds the game
+    seconds and ``minutes`` is dropped. Sorted input is not copied.
+    """
+    seconds = np.asarray(columns["minutes"]) * 60 + np.asarray(columns["seconds"])
+    if index is None:
+        index = np.arange(len(seconds))
+    prepared = {"index": np.asarray(index)}
+    for column, values in columns.items():
+        if column == "minutes":
+            continue
+        prepared[column] = seconds if column == "seconds" else np.asarray(values)
+
+    order = event_order(seconds, prepared["event"])
+    if order is not None:
+        prepared = {column: values[order] for column, values in prepared.items()}
+    return prepared
+
+
 def prepare_events(events):
     events.columns = [col.lower() for col in events.columns]
-    ordered_events = events.sort_values(by=["minutes", "seconds", "event"])
-    ordered_events = ordered_events.reset_index()
-    ordered_events["seconds"] = ordered_events["minutes"] * 60 + ordered_events["seconds"]
-    return ordered_events.drop(columns="minutes")
+    columns = {column: events[column].to_numpy() for column in events.columns}
+    return pd.DataFrame(prepare_event_arrays(columns, events.index.to_numpy()), copy=False)
 
 
 @dataclass
@@ -65,6 +88,10 @@ class Event:
             if isinstance(self.__dict__[key], str):
                 if value == "":
                     result[key] = f"{key} must not be empty"
+        if self.minutes < 0:
+            result["minutes"] = "minutes must not be negative"
+        if not 0 <= self.seconds < 60:
+            result["seconds"] = "seconds must be between 0 and 59"
         return result
 
 _FORM_COMPONENT_KEY="dc_form_component"
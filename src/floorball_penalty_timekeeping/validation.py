@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.session import PREPARED_COLUMNS
+from floorball_penalty_timekeeping.utils import prepare_event_arrays
+from floorball_penalty_timekeeping.utils import seconds_to_mmss
+
+ERROR = "error"
+WARNING = "warning"
+NUM_TEAMS = 2
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    """Finding of the validation for the event at ``position`` of the input."""
+
+    position: int
+    field: str
+    message: str
+    severity: str = ERROR
+
+
+def validate_event_arrays(columns, rules=None):
+    """Check prepared events for consistency in a single chronological pass.
+
+    ``columns`` are the columns returned by :func:`utils.prepare_event_arrays`
+    or the frame of :func:`utils.prepare_events`. Errors are events that
+    can not happen, warnings events that most likely were entered twice or
+    wrongly. Only a constant amount of state is kept per player, so the
+    check is cheap enough to run on every change of the events.
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    compiled = rules.compiled
+    diagnostics = []
+
+    teams = []
+    # second of the match penalty and of the first personal penalty of every player
+    match_penalties = {}
+    personal_penalties = {}
+    # events and goals of the current second, to find duplicates
+    current_second = None
+    events_of_second = set()
+    goals_of_second = 0
+
+    for position, team, player, event, second in zip(
+        *(np.asarray(columns[column]).tolist() for column in PREPARED_COLUMNS)
+    ):
+        time = seconds_to_mmss(second)
+        if event not in rules.events:
+            diagnostics.append(Diagnostic(position, "event", f"Unknown event code {event}."))
+            continue
+
+        if second < 0:
+            diagnostics.append(Diagnostic(position, "minutes", f"The event at {time} happens before the start of the match."))
+        elif second > rules.match_duration:
+            # overtime is not part of the rule set, later events are only suspicious
+            diagnostics.append(Diagnostic(
+                position, "minutes",
+                f"The event at {time} happens after the end of the match at {seconds_to_mmss(rules.match_duration)}.",
+                WARNING,
+            ))
+
+        if team not in teams:
+            if len(teams) == NUM_TEAMS:
+                diagnostics.append(Diagnostic(position, "team", f"The match already has the teams {teams[0]} and {teams[1]}."))
+            else:
+                teams.append(team)
+
+        key = team, str(player)
+        ejected = match_penalties.get(key)
+        if ejected is not None and second > ejected:
+            diagnostics.append(Diagnostic(
+                position, "player",
+                f"Player {player} of team {team} got a match penalty at {seconds_to_mmss(ejected)}.",
+            ))
+
+        if second != current_second:
+            current_second = second
+            events_of_second.clear()
+            goals_of_second = 0
+        if (key, event) in events_of_second:
+            diagnostics.append(Diagnostic(
+                position, "event", f"Player {player} of team {team} has the same event at {time} twice.", WARNING,
+            ))
+        events_of_second.add((key, event))
+
+        if compiled.bench_penalties[event] == 0:
+            goals_of_second += 1
+            if goals_of_second == 2:
+                diagnostics.append(Diagnostic(position, "seconds", f"More than one goal at {time}.", WARNING))
+        elif compiled.personal[event]:
+            if compiled.personal_duration(event) is None:
+                match_penalties.setdefault(key, second)
+            elif key in personal_penalties:
+                diagnostics.append(Diagnostic(
+                    position, "event",
+                    f"Player {player} of team {team} already got a personal penalty at "
+                    f"{seconds_to_mmss(personal_penalties[key])}, the second one is a match penalty.",
+                    WARNING,
+                ))
+            else:
+                personal_penalties[key] = second
+
+    return diagnostics
+
+
+def validate_events(events, rules=None):
+    """Validate events in the input layout, a list of events or a DataFrame.
+
+    Positions of the diagnostics refer to the order of ``events``.
+    """
+    events = pd.DataFrame(events)
+    if events.empty:
+        return []
+    columns = {column.lower(): events[column].to_numpy() for column in events.columns}
+
+    diagnostics = [
+        Diagnostic(int(position), "seconds", f"Seconds must be between 0 and 59, got {columns['seconds'][position]}.")
+        for position in np.flatnonzero((columns["seconds"] < 0) | (columns["seconds"] > 59))
+    ]
+    prepared = prepare_event_arrays(columns)
+    diagnostics += validate_event_arrays(prepared, rules)
+
+    chronological = {position: rank for rank, position in enumerate(prepared["index"].tolist())}
+    return sorted(diagnostics, key=lambda diagnostic: chronological[diagnostic.position])
+
+
+def errors(diagnostics):
+    return [diagnostic for diagnostic in diagnostics if diagnostic.severity == ERROR]
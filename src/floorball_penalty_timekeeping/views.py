@@ -1,21 +1,31 @@
 from dataclasses import MISSING
 from dataclasses import fields
+from io import BytesIO
 
 import numpy as np
 import pandas as pd
 import streamlit as st
 from matplotlib import pyplot as plt
 
+from floorball_penalty_timekeeping.render import COLORS
+from floorball_penalty_timekeeping.render import CachedFigure
+from floorball_penalty_timekeeping.render import HtmlTable
+from floorball_penalty_timekeeping.render import assign_lanes
+from floorball_penalty_timekeeping.render import default_renderer
+from floorball_penalty_timekeeping.render import penalty_scene
+from floorball_penalty_timekeeping.render import player_ticks
+from floorball_penalty_timekeeping.render import scene_to_svg
+from floorball_penalty_timekeeping.render import time_ticks
+from floorball_penalty_timekeeping.results import TIME_COLUMNS
+from floorball_penalty_timekeeping.results import as_penalty_table
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
 from floorball_penalty_timekeeping.utils import _FORM_COMPONENT_KEY
 from floorball_penalty_timekeeping.utils import _FORM_VALIDATION_KEY
-from floorball_penalty_timekeeping.utils import ALL_EVENTS
 from floorball_penalty_timekeeping.utils import Event
-from floorball_penalty_timekeeping.utils import seconds_to_mmss
+from floorball_penalty_timekeeping.utils import format_mmss
 
-COLORS = {"A": "red", "B": "blue"}
 
-
-def create_input_form(dataobj, action) -> None:
+def create_input_form(dataobj, action, rules=DEFAULT_RULES) -> None:
 
     validation_results = st.session_state.pop(_FORM_VALIDATION_KEY, {})
 
@@ -42,8 +52,9 @@ def create_input_form(dataobj, action) -> None:
                 if field.name == "team":
                     result[field.name] = st.selectbox(label, options=["A", "B"], key=field_key)
                 elif field.name == "event":
-                    result[field.name] = st.selectbox(label, options=[ALL_EVENTS[_]["display"] for _ in ALL_EVENTS], key=field_key)
-                    result[field.name] = [event for event in ALL_EVENTS if ALL_EVENTS[event]["display"] == result[field.name]][0]
+                    result[field.name] = st.selectbox(
+                        label, options=list(rules.events), format_func=rules.display, key=field_key
+                    )
                 elif field.type is str:
                     result[field.name] = st.text_input(label, value, key=field_key)
                 elif field.type is int:
@@ -68,76 +79,123 @@ def create_input_form(dataobj, action) -> None:
                 action(new_object)
 
 
-def create_result_layout(events, penalties, goals, teams):
+def create_result_layout(events, penalties, goals, teams, cache=None, key=None, rules=DEFAULT_RULES):
+    """Event table with its controls and, unless ``penalties`` is None, the timekeeping."""
+
+    def cached(name, function):
+        if cache is None or key is None:
+            return function()
+        return cache.get_or_compute(f"{key}:{name}", function)
 
     st.write("# Events")
-    st.write(display_event_table(events).to_html(), unsafe_allow_html=True)
+    st.write(cached("events", lambda: render_table("events", display_event_table(events, rules), _style_row)), unsafe_allow_html=True)
     if st.button("Remove last event"):
-        st.session_state.events.pop()
+        st.session_state.session.pop_last()
         st.rerun()
 
+    if penalties is None:
+        return
+
     if not all([penalty_table.empty for penalty_table in penalties.values()]):
         st.write("# Timekeeping ")
         st.write("## Plot")
 
-        fig, ax = plt.subplots(1)
-
-        penalties_to_plot, plot_params = _prepare_penalty_times_for_plot(penalties, teams)
-        goals_to_plot = _prepare_goals(goals, teams)
-        plot_bench_penalties(ax, penalties_to_plot)
-        plot_goals(ax, goals_to_plot)
-        plot_personal_penalties(ax, penalties_to_plot)
-        make_plot_stylish(ax, **plot_params)
-
-        st.pyplot(fig)
+        renderer = default_renderer()
+        figure = cached(f"figure:{renderer}", lambda: render_penalty_figure(penalties, goals, teams, renderer))
+        if renderer == "svg":
+            st.markdown(figure, unsafe_allow_html=True)
+        else:
+            st.image(figure)
 
         tables = st.columns(2)
         for table, team in zip(tables, teams):
             with table:
                 st.write(f"## {team}")
-                st.write(display_penalty_table(penalties[team]).to_html(), unsafe_allow_html=True)
+                st.write(
+                    cached(f"penalties:{team}", lambda: render_table(f"penalties:{team}", display_penalty_table(penalties[team]))),
+                    unsafe_allow_html=True,
+                )
+
+
+def create_penalty_figure(penalties, goals, teams):
+    fig, ax = plt.subplots(1)
+
+    penalties_to_plot, plot_params = _prepare_penalty_times_for_plot(penalties, teams)
+    goals_to_plot = _prepare_goals(goals.copy(), teams)
+    plot_bench_penalties(ax, penalties_to_plot)
+    plot_goals(ax, goals_to_plot)
+    plot_personal_penalties(ax, penalties_to_plot)
+    make_plot_stylish(ax, **plot_params)
+
+    return fig
+
+
+def render_penalty_figure(penalties, goals, teams, renderer="matplotlib"):
+    if renderer == "matplotlib":
+        return _figure_to_png(create_penalty_figure(penalties, goals, teams))
+
+    penalties_to_plot, plot_params = _prepare_penalty_times_for_plot(penalties, teams)
+    scene = penalty_scene(penalties_to_plot, _prepare_goals(goals.copy(), teams), **plot_params)
+    if renderer == "svg":
+        return scene_to_svg(scene)
+
+    # the figure lives as long as the browser session and is only updated
+    figure = st.session_state.setdefault("figure", CachedFigure())
+    figure.draw(scene)
+    return figure.to_png()
+
 
+def _figure_to_png(fig):
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+    plt.close(fig)
+    return buffer.getvalue()
 
-def _format_event_display(events):
+
+def _format_event_display(events, rules=DEFAULT_RULES):
     return events.replace(
-        {event: ALL_EVENTS[event]["display"] for event in ALL_EVENTS}
+        {event: rule.display for event, rule in rules.events.items()}
     )
 
 
 def display_penalty_table(penalites):
-    df = penalites[["player", "to_bench", "time_start", "time_end"]].rename(
-        columns={"player": "Player", "to_bench": "To bench", "time_start": "Start", "time_end": "End"}
-    )
-    for col in ["To bench", "Start", "End"]:
-        df[col] = df[col].apply(seconds_to_mmss)
+    table = as_penalty_table(penalites)
+    df = pd.DataFrame({"Player": table.player})
+    for col, column in zip(["To bench", "Start", "End"], TIME_COLUMNS):
+        df[col] = format_mmss(table.seconds(column))
 
     return df
 
 
-def display_event_table(events):
-    df = pd.DataFrame(columns=["Time", "Team", "Player"])
+def display_event_table(events, rules=DEFAULT_RULES):
+    events = events.sort_values(by=["seconds", "event"])
 
-    events = events.sort_values(by=["seconds", "event"]).reset_index()
+    return pd.DataFrame({
+        "Time": format_mmss(events["seconds"].to_numpy()),
+        "Team": events["team"].to_numpy(),
+        "Player": events["player"].to_numpy(),
+        "Event": _format_event_display(events["event"], rules).to_numpy(),
+    })
 
-    df["Time"] = events["seconds"].apply(seconds_to_mmss)
-    df["Team"] = events["team"]
-    df["Player"] = events["player"]
-    df["Event"] = _format_event_display(events["event"])
 
-    return df.style.apply(_style_row, axis=1)
+def render_table(name, df, row_style=None):
+    """HTML of a table, rows that did not change since the last rerun are reused."""
+    tables = st.session_state.setdefault("tables", {})
+    if name not in tables or tables[name].columns != list(df.columns):
+        tables[name] = HtmlTable(df.columns, row_style)
+    return tables[name].render(df.itertuples(index=False, name=None))
 
 
 def _style_row(row):
     if row['Team'] == "A":
-        color = 'background-color: #fbb0af;'
-    else:
-        color = 'background-color: #9cdeff;'
-    return [color] * len(row)
+        return 'background-color: #fbb0af;'
+    return 'background-color: #9cdeff;'
 
 
-def _prepare_penalty_times_for_plot(penalty_times_by_teams, teams):
+def _prepare_penalty_times_for_plot(penalty_times_by_teams, teams, lanes="clusters"):
+    tables = {team: as_penalty_table(penalty_times_by_teams[team]) for team in teams}
     unique_players_per_team = {
-        team: penalty_times_by_teams[team]["player"].unique() for team in teams
+        team: pd.unique(tables[team].player) for team in teams
     }
     all_player_ticks = []
     y_value_player_map = {}
@@ -157,7 +215,12 @@ def _prepare_penalty_times_for_plot(penalty_times_by_teams, teams):
         y_value_player_map.update(
             {y: player for player, y in player_y_value_map.items()}
         )
-        df = penalty_times_by_teams[team].copy()
+        table = tables[team]
+        df = pd.DataFrame({
+            "event_id": table.event_id,
+            "player": table.player,
+            **{column: table.seconds(column) for column in TIME_COLUMNS},
+        })
 
         max_time = max(max_time, df["time_end"].max())
         min_time = min(min_time, df["to_bench"].min())
@@ -171,11 +234,11 @@ def _prepare_penalty_times_for_plot(penalty_times_by_teams, teams):
 
         df["y_base"] = df["player"].map(player_y_value_map)
         all_player_ticks += list(set(df["y_base"].tolist()))
-        df["y_base_copy"] = df["y_base"]
-        delta = 0.25
-        df = df.groupby("y_base").apply(
-            assign_y_locations, delta=delta, include_groups=False
-        ).reset_index(drop=True)
+        order, y_position = assign_lanes(
+            df["y_base"], df["to_bench"], df["time_end"], delta=0.25, mode=lanes
+        )
+        df = df.iloc[order].reset_index(drop=True)
+        df["y_position"] = y_position
 
         df_by_team[team] = df
 
@@ -234,30 +297,17 @@ def make_plot_stylish(ax, all_player_ticks=None, max_time=None, min_time=None, y
     ax.spines['top'].set_color('none')
     ax.spines['right'].set_color('none')
 
-    all_player_ticks = sorted(all_player_ticks)
+    all_player_ticks, minor_ticks = player_ticks(all_player_ticks)
     ax.set_yticks(all_player_ticks, minor=False)
-    minor_ticks = (
-        [tick - 0.5 for tick in all_player_ticks]
-        + [-0.5] + [all_player_ticks[-1] + 0.5]
-    )
     ax.set_yticks(minor_ticks, minor=True)
     ax.set_yticklabels([y_value_player_map[tick] for tick in all_player_ticks])
     ax.yaxis.set_ticks_position('left')
 
     ax.xaxis.set_ticks_position('bottom')
 
-    major_time_step = 60
-    while (max_time - min_time) // major_time_step > 8:
-        major_time_step += 60
-
-    major_ticks = np.arange(
-        (min_time // major_time_step) * major_time_step,
-        max_time + 1,
-        major_time_step
-    )
+    major_ticks = time_ticks(min_time, max_time)
     ax.set_xticks(major_ticks)
-    f = np.vectorize(seconds_to_mmss)
-    ax.set_xticklabels(f(major_ticks))
+    ax.set_xticklabels(format_mmss(major_ticks))
 
     ax.xaxis.grid(which="major")
     ax.yaxis.grid(which="minor")
@@ -268,32 +318,3 @@ def make_plot_stylish(ax, all_player_ticks=None, max_time=None, min_time=None, y
 def plot_personal_penalties(ax, personal_penalties):
     pass
 
-
-def assign_y_locations(group, delta):
-    group = group.sort_values(by="to_bench").reset_index(drop=True)
-    results = []
-    n = len(group)
-    overlapping = {0: [0]}
-
-    k = 0
-    for i in range(1, n):
-        if group.loc[i, "to_bench"] <= group.loc[i - 1, "time_end"]:
-            overlapping[k] += [i]
-        else:
-            k += 1
-            overlapping[k] = [i]
-
-    center = group["y_base_copy"].iloc[0]
-    min_value = center - delta
-    max_value = center + delta
-
-    for overlapped in overlapping.values():
-        num_overlaps = len(overlapped)
-        if num_overlaps > 1:
-            results += np.linspace(min_value, max_value, num_overlaps).tolist()
-        else:
-            results += [center]
-
-    group["y_position"] = results
-
-    return group
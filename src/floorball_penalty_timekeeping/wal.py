@@ -0,0 +1,193 @@
+import json
+import os
+import pickle
+import tempfile
+from urllib.parse import quote
+from urllib.parse import unquote
+
+from floorball_penalty_timekeeping.session import TimekeepingSession
+from floorball_penalty_timekeeping.session import normalize_event
+
+LOG_SUFFIX = ".log"
+SNAPSHOT_SUFFIX = ".snapshot"
+
+
+class EventLog:
+    """Append-only log of the changes of one match with snapshots of its state.
+
+    Every change is one JSON line with a sequence number. Lines are flushed
+    to the operating system right away, so a crash of the process loses
+    nothing, and synced to disk every ``sync_every`` changes, so a crash of
+    the machine loses at most that many. A snapshot pickles the events and
+    the match state and truncates the log, only changes after the latest
+    snapshot are replayed when the match is opened again. Only point
+    ``directory`` to a location that is not writable by untrusted users.
+    """
+
+    def __init__(self, directory, name, sync_every=16):
+        self.directory = directory
+        self.name = name
+        self.sync_every = sync_every
+        self.sequence = 0
+        self._unsynced = 0
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, quote(name, safe=""))
+        self.log_path = path + LOG_SUFFIX
+        self.snapshot_path = path + SNAPSHOT_SUFFIX
+        self._file = None
+
+    @staticmethod
+    def names(directory):
+        """Names of the matches with a log or a snapshot in ``directory``."""
+        if not os.path.isdir(directory):
+            return []
+        names = []
+        for filename in sorted(os.listdir(directory)):
+            for suffix in [LOG_SUFFIX, SNAPSHOT_SUFFIX]:
+                if filename.endswith(suffix):
+                    names.append(unquote(filename[:-len(suffix)]))
+        return list(dict.fromkeys(names))
+
+    def read(self):
+        """Latest snapshot, ``None`` without one, and the changes logged after it.
+
+        A last line that was only partly written is dropped from the log.
+        """
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+        sequence = snapshot["sequence"] if snapshot is not None else 0
+
+        changes = []
+        valid_size = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith(b"\n"):
+                        break
+                    valid_size += len(line)
+                    # changes already in the snapshot if it was not followed by the truncation
+                    if change["sequence"] > sequence:
+                        changes.append(change)
+            if valid_size < os.path.getsize(self.log_path):
+                os.truncate(self.log_path, valid_size)
+
+        self.sequence = changes[-1]["sequence"] if changes else sequence
+        return snapshot, changes
+
+    def write(self, operation, **arguments):
+        if self._file is None:
+            self._file = open(self.log_path, "ab")
+        self.sequence += 1
+        change = {"sequence": self.sequence, "operation": operation, **arguments}
+        self._file.write(json.dumps(change).encode() + b"\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+        return self.sequence
+
+    def sync(self):
+        if self._file is not None and self._unsynced > 0:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def snapshot(self, events, match):
+        """Store the state after all logged changes and truncate the log."""
+        self.sync()
+        snapshot = {"sequence": self.sequence, "events": events, "match": match}
+        # write to a temporary file first, a crash never leaves a partial snapshot
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path, self.snapshot_path)
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        open(self.log_path, "wb").close()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class DurableSession(TimekeepingSession):
+    """Timekeeping session whose changes survive restarts of the app or server.
+
+    Opening a session loads the latest snapshot of the match and replays the
+    changes logged after it. Every change is logged before it is returned
+    and a snapshot is taken every ``snapshot_every`` changes. Only one
+    session may write the log of a match at a time, threads sharing it are
+    serialized by its ``lock``, which readers from other threads hold too.
+    """
+
+    def __init__(self, directory, name, sync_every=16, snapshot_every=100, rules=None):
+        super().__init__(rules=rules)
+        self.log = EventLog(directory, name, sync_every)
+        self.snapshot_every = snapshot_every
+        self._changes = 0
+
+        snapshot, changes = self.log.read()
+        if snapshot is not None:
+            self.restore(snapshot["events"], snapshot["match"])
+        for change in changes:
+            self._apply(change)
+
+    def _apply(self, change):
+        arguments = {key: value for key, value in change.items() if key not in ["sequence", "operation"]}
+        return getattr(super(), change["operation"])(**arguments)
+
+    def _change(self, operation, **arguments):
+        with self.lock:
+            # changes replay deterministically, failing changes are not logged
+            result = getattr(super(), operation)(**arguments)
+            self.log.write(operation, **arguments)
+
+            self._changes += 1
+            if self._changes >= self.snapshot_every:
+                self.snapshot()
+            return result
+
+    def append(self, event):
+        return self._change("append", event=normalize_event(event))
+
+    def pop_last(self):
+        return self._change("pop_last")
+
+    def insert(self, event, position=None):
+        return self._change("insert", event=normalize_event(event), position=position)
+
+    def edit(self, position, replacement=None, **changes):
+        if replacement is not None:
+            replacement = normalize_event(replacement)
+        return self._change("edit", position=position, replacement=replacement, **changes)
+
+    def delete(self, position):
+        return self._change("delete", position=position)
+
+    def replace_events(self, events):
+        return self._change("replace_events", events=[normalize_event(event) for event in events])
+
+    def snapshot(self):
+        with self.lock:
+            self.log.snapshot(*self.state())
+            self._changes = 0
+
+    def sync(self):
+        with self.lock:
+            self.log.sync()
+
+    def close(self):
+        with self.lock:
+            self.log.close()
+
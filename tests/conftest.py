@@ -0,0 +1,12 @@
+import json
+import os
+
+__testpath__ = os.path.dirname(os.path.abspath(__file__))
+DATASETS_PATH = os.path.join(__testpath__, "data", "datasets.json")
+
+with open(DATASETS_PATH, "r") as f:
+    DATASETS = json.load(f)
+
+
+def make_event(team, player, event, minutes, seconds):
+    return {"team": team, "player": player, "event": event, "minutes": minutes, "seconds": seconds}
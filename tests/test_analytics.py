@@ -0,0 +1,102 @@
+from dataclasses import replace
+
+import pandas as pd
+from conftest import DATASETS_PATH
+from conftest import make_event
+
+from floorball_penalty_timekeeping.analytics import PenaltyAnalytics
+from floorball_penalty_timekeeping.io import MatchArchive
+from floorball_penalty_timekeeping.io import matches_from_json
+from floorball_penalty_timekeeping.io import write_match_archive
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.rules import RuleSet
+
+MATCH = [
+    make_event("A", 12, 2, 1, 0),
+    # ends the penalty of 12 after one minute
+    make_event("B", 7, 0, 2, 0),
+    make_event("A", 3, 2, 3, 0),
+    make_event("A", 4, 2, 3, 0),
+    # has to wait for one of the two running penalties
+    make_event("A", 5, 2, 3, 0),
+    make_event("B", 7, 1, 9, 0),
+]
+
+
+def test_match_aggregates():
+    analytics = PenaltyAnalytics()
+    analytics.add_events("final", pd.DataFrame(MATCH))
+
+    power_play = analytics.power_play_seconds()
+    assert power_play.loc["B", "power_play"] == 60 + 240
+    assert power_play.loc["A", "short_handed"] == 60 + 240
+
+    cap_hits = analytics.cap_hits()
+    assert cap_hits.loc["A", "cap_hits"] == 1
+    assert cap_hits.loc["A", "seconds_at_cap"] == 120
+
+    penalty_kill = analytics.penalty_kill()
+    assert penalty_kill.loc["A", "killed"] == 3
+    assert penalty_kill.loc["A", "terminated_by_goal"] == 1
+    assert penalty_kill.loc["A", "success_rate"] == 0.75
+
+    bench_seconds = analytics.bench_seconds()
+    assert bench_seconds.loc[("A", 12)] == 60
+    assert bench_seconds.loc[("A", 5)] == 240
+
+
+def test_bench_seconds_merge_overlapping_penalties():
+    analytics = PenaltyAnalytics()
+    analytics.add_events("major", pd.DataFrame([make_event("A", 12, 4, 1, 0)]))
+    analytics.add_events("minors", pd.DataFrame([make_event("A", 12, 2, 1, 0), make_event("A", 12, 2, 2, 0)]))
+
+    # both parts of the major penalty are on the bench from 1:00 to 5:00,
+    # the minors from 1:00 to 3:00 and from 2:00 to 5:00
+    assert analytics.bench_seconds().loc[("A", 12)] == 240 + 240
+
+
+def test_late_events_are_bench_penalties():
+    # events of a season slice keep their index, far above the offset of personal penalties
+    analytics = PenaltyAnalytics()
+    analytics.add_events("slice", pd.DataFrame(MATCH, index=range(1500, 1500 + len(MATCH))))
+
+    assert not analytics.penalties()["personal"].any()
+    assert analytics.power_play_seconds().loc["B", "power_play"] == 60 + 240
+
+
+def test_penalty_kill_follows_rules():
+    rules = RuleSet({**DEFAULT_RULES.events, 2: replace(DEFAULT_RULES.events[2], bench_duration=90)}, max_running=3)
+    analytics = PenaltyAnalytics(rules)
+    analytics.add_events("final", pd.DataFrame(MATCH))
+
+    # the minors last 90 seconds and all three run at the same time
+    penalty_kill = analytics.penalty_kill()
+    assert penalty_kill.loc["A", "killed"] == 3
+    assert penalty_kill.loc["A", "terminated_by_goal"] == 1
+    assert analytics.cap_hits().loc["A", "seconds_at_cap"] == 90
+
+
+def test_incremental_add():
+    analytics = PenaltyAnalytics()
+    analytics.add_events("first", pd.DataFrame(MATCH))
+    first = analytics.power_play_seconds()
+    analytics.add_events("second", pd.DataFrame(MATCH))
+
+    assert len(analytics) == 2
+    pd.testing.assert_frame_equal(analytics.power_play_seconds(), first * 2)
+    assert len(analytics.penalties()) == 8
+
+
+def test_from_archive(tmp_path):
+    path = tmp_path / "season.fbpt"
+    write_match_archive(matches_from_json(DATASETS_PATH), path)
+
+    expected = PenaltyAnalytics()
+    for name, events in matches_from_json(DATASETS_PATH):
+        expected.add_events(name, events)
+
+    with MatchArchive(path) as archive:
+        analytics = PenaltyAnalytics.from_archive(archive)
+
+    pd.testing.assert_frame_equal(analytics.strength(), expected.strength())
+    pd.testing.assert_series_equal(analytics.bench_seconds(), expected.bench_seconds())
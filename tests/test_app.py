@@ -0,0 +1,25 @@
+from conftest import make_event
+from streamlit.testing.v1 import AppTest
+
+from floorball_penalty_timekeeping.session import TimekeepingSession
+
+
+def _app():
+    from floorball_penalty_timekeeping.app import layout
+
+    layout()
+
+
+def test_inconsistent_events_can_be_removed():
+    app = AppTest.from_function(_app)
+    app.session_state.session = TimekeepingSession([
+        make_event("A", "4", 5, 10, 0),
+        make_event("A", "4", 2, 12, 0),
+    ])
+    app.run()
+    assert len(app.error) == 1
+    remove = next(button for button in app.button if button.label == "Remove last event")
+
+    remove.click().run()
+    assert len(app.session_state.session) == 1
+    assert len(app.error) == 0
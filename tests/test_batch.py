@@ -0,0 +1,35 @@
+import json
+
+import pandas as pd
+from click.testing import CliRunner
+from conftest import DATASETS_PATH
+
+from floorball_penalty_timekeeping.batch import timekeeping_many
+from floorball_penalty_timekeeping.cli import program_run
+from floorball_penalty_timekeeping.io import matches_from_json
+
+
+def test_timekeeping_many_keeps_order_and_captures_errors():
+    matches = list(matches_from_json(DATASETS_PATH))
+    matches.insert(2, ("broken", [{"team": "A", "player": 1}]))
+
+    serial = list(timekeeping_many(matches, workers=1))
+    parallel = list(timekeeping_many(matches, workers=2, prefetch=1))
+
+    assert [result.name for result in parallel] == [name for name, _ in matches]
+    assert [result.ok for result in parallel] == [name != "broken" for name, _ in matches]
+    assert "KeyError" in parallel[2].error
+
+    for expected, result in zip(serial, parallel):
+        if expected.ok:
+            for team, penalty_times in expected.penalty_times_by_team.items():
+                pd.testing.assert_frame_equal(result.penalty_times_by_team[team], penalty_times)
+
+
+def test_batch_command():
+    result = CliRunner().invoke(program_run, ["batch", DATASETS_PATH, "--workers", "1"])
+    assert result.exit_code == 0
+
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert records[0]["match"] == "test_terminate_running_minor_penalty"
+    assert sum(penalty["time_end"] for penalty in records[0]["penalties"]["A"]) == 330
@@ -0,0 +1,28 @@
+import pytest
+
+from floorball_penalty_timekeeping.benchmark import compare_benchmarks
+from floorball_penalty_timekeeping.benchmark import generate_match
+from floorball_penalty_timekeeping.benchmark import run_benchmarks
+
+
+def test_generate_match():
+    events = generate_match(50, penalty_share=1, penalty_mix={3: 1}, seed=1)
+    assert events == generate_match(50, penalty_share=1, penalty_mix={3: 1}, seed=1)
+    assert len(events) == 50
+    assert {event["event"] for event in events} == {3}
+
+    seconds = [event["minutes"] * 60 + event["seconds"] for event in events]
+    assert seconds == sorted(seconds)
+
+    with pytest.raises(ValueError):
+        generate_match(10, penalty_mix={7: 1})
+
+
+def test_run_and_compare_benchmarks():
+    results = run_benchmarks(sizes=[10], engines=["python", "pandas"], repeat=1)
+    names = [result["benchmark"] for result in results["results"]]
+    assert names == ["prepare_events", "timekeeping[python]", "timekeeping[pandas]", "prepare_penalty_times_for_plot"]
+
+    assert compare_benchmarks(results, results) == []
+    slower = {"results": [{**result, "median": result["median"] * 2} for result in results["results"]]}
+    assert len(compare_benchmarks(slower, results)) == 4
@@ -0,0 +1,87 @@
+import os
+
+import pandas as pd
+from conftest import DATASETS
+
+from floorball_penalty_timekeeping.cache import TimelineCache
+from floorball_penalty_timekeeping.cache import cached_timekeeping
+from floorball_penalty_timekeeping.cache import events_key
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.rules import RuleSet
+from floorball_penalty_timekeeping.session import TimekeepingSession
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+
+def _events(name):
+    return prepare_events(pd.DataFrame(DATASETS[name]))
+
+
+def test_events_key_depends_on_content_and_options():
+    name = list(DATASETS)[0]
+    events = _events(name)
+    key = events_key(events)
+
+    assert events_key(_events(name)) == key
+    assert events_key(events, engine="pandas") != key
+
+    changed = events.copy()
+    changed.loc[changed.index[0], "seconds"] += 1
+    assert events_key(changed) != key
+
+
+def test_lru_eviction():
+    cache = TimelineCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_directory_is_shared(tmp_path):
+    TimelineCache(directory=tmp_path).put("key", {"value": 1})
+
+    other = TimelineCache(directory=tmp_path)
+    assert other.get("key") == {"value": 1}
+    assert other.hits == 1
+
+    other.clear()
+    assert TimelineCache(directory=tmp_path).get("key") is None
+
+
+def test_directory_evicts_least_recently_used_files(tmp_path):
+    cache = TimelineCache(maxsize=1, directory=tmp_path, max_files=2)
+    for age, key in enumerate(["a", "b"]):
+        cache.put(key, key)
+        os.utime(tmp_path / f"{key}.pkl", (age, age))
+    # reading "a" from the directory makes "b" the least recently used file
+    assert TimelineCache(directory=tmp_path).get("a") == "a"
+    cache.put("c", "c")
+
+    assert sorted(os.listdir(tmp_path)) == ["a.pkl", "c.pkl"]
+
+
+def test_content_key_depends_on_rules():
+    events = DATASETS[list(DATASETS)[0]]
+    rules = RuleSet(DEFAULT_RULES.events, max_running=3)
+    assert TimekeepingSession(events, rules=rules).content_key() != TimekeepingSession(events).content_key()
+    assert TimekeepingSession(events, rules=rules).content_key() == TimekeepingSession(events, rules=rules).content_key()
+
+
+def test_cached_timekeeping():
+    cache = TimelineCache()
+    name = list(DATASETS)[0]
+
+    first = cached_timekeeping(_events(name), cache=cache)
+    second = cached_timekeeping(_events(name), cache=cache)
+
+    assert cache.misses == 1
+    assert cache.hits == 1
+    assert second is first
+    for team, penalty_times in timekeeping(_events(name)).items():
+        pd.testing.assert_frame_equal(first[team], penalty_times)
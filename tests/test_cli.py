@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+
+from click.testing import CliRunner
+from conftest import DATASETS
+from conftest import DATASETS_PATH
+
+from floorball_penalty_timekeeping.cli import program_run
+from floorball_penalty_timekeeping.wal import DurableSession
+
+GUI_MODULES = ["streamlit", "matplotlib"]
+
+
+def _imported_modules(code):
+    code += "\nimport sys, json; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return {module.split(".")[0] for module in json.loads(result.stdout.splitlines()[-1])}
+
+
+def test_compute_json():
+    result = CliRunner().invoke(program_run, ["compute", DATASETS_PATH, "--match", "test_example_6"])
+
+    assert result.exit_code == 0, result.output
+    penalties = json.loads(result.output)
+    assert penalties["A"] == [
+        {"event_id": 0, "player": 93, "to_bench": 150, "time_start": 150, "time_end": 270},
+    ]
+
+
+def test_compute_csv():
+    result = CliRunner().invoke(
+        program_run, ["compute", DATASETS_PATH, "--match", "test_example_6", "--format", "csv"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        "team,event_id,player,to_bench,time_start,time_end",
+        "A,0,93,150,150,270",
+        "B,1,75,180,180,300",
+    ]
+
+
+def test_compute_unknown_match():
+    result = CliRunner().invoke(program_run, ["compute", DATASETS_PATH, "--match", "final"])
+    assert result.exit_code == 2
+
+
+def test_import_budget():
+    # the console script must start without the scientific stack
+    modules = _imported_modules("import floorball_penalty_timekeeping.cli")
+    assert not modules & {"pandas", "numpy", *GUI_MODULES}
+
+    modules = _imported_modules(
+        "from floorball_penalty_timekeeping.cli import program_run\n"
+        f"program_run(['compute', {DATASETS_PATH!r}, '--match', 'test_example_1'], standalone_mode=False)"
+    )
+    assert "pandas" in modules
+    assert not modules & set(GUI_MODULES)
+
+
+def test_fuzz():
+    result = CliRunner().invoke(program_run, ["fuzz", "--oracle", "python", "--matches", "20"])
+
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("20 matches in ")
+
+
+def test_recover(tmp_path):
+    session = DurableSession(tmp_path, "test_example_6")
+    for event in DATASETS["test_example_6"]:
+        session.append(event)
+    session.close()
+
+    result = CliRunner().invoke(program_run, ["recover", str(tmp_path), "--match", "test_example_6", "--snapshot"])
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output)["A"] == [
+        {"event_id": 0, "player": 93, "to_bench": 150, "time_start": 150, "time_end": 270},
+    ]
+    assert os.path.getsize(session.log.log_path) == 0
+
+    result = CliRunner().invoke(program_run, ["recover", str(tmp_path), "--match", "final"])
+    assert result.exit_code == 2
@@ -0,0 +1,73 @@
+from floorball_penalty_timekeeping.fuzz import check
+from floorball_penalty_timekeeping.fuzz import differential
+from floorball_penalty_timekeeping.fuzz import generate_events
+from floorball_penalty_timekeeping.fuzz import shrink
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+
+
+def test_generate_events_follows_rules():
+    for seed in range(200):
+        events = generate_events(seed, duration=1200)
+        assert events == generate_events(seed, duration=1200)
+        assert 1 <= len(events) <= 16
+
+        ejected = {}
+        personal = set()
+        for event in sorted(events, key=lambda event: (event["minutes"], event["seconds"], event["event"])):
+            key = event["team"], event["player"]
+            second = event["minutes"] * 60 + event["seconds"]
+            assert second < 1200
+            assert ejected.get(key, second) >= second
+            if event["event"] == 3:
+                assert key not in personal
+                personal.add(key)
+            elif event["event"] == 5:
+                ejected[key] = second
+
+
+def test_python_engine_matches_reference():
+    report = differential("python", "pandas", matches=30)
+    assert report.matches == 30
+    assert report.ok
+
+
+def _broken_engine(ordered_events):
+    """Python engine that ends every ended penalty one second late once a major penalty was given."""
+    penalty_times_by_team, pauses_by_team = timekeeping(ordered_events, return_pauses=True, as_tables=True)
+    if (ordered_events["event"] == 4).any():
+        for table in penalty_times_by_team.values():
+            table.time_end[table.time_end > 0] += 1
+    return penalty_times_by_team, pauses_by_team
+
+
+def _raising_engine(ordered_events):
+    raise IndexError("not enough ended penalties")
+
+
+def test_errors_are_mismatches():
+    events = generate_events(0)
+    mismatch = check(events, _raising_engine, _raising_engine)
+    assert mismatch.result == mismatch.expected == {"error": "IndexError: not enough ended penalties"}
+
+    report = differential(_raising_engine, "python", matches=3)
+    assert len(report.mismatches) == 1
+    assert len(report.mismatches[0].events) == 1
+
+
+def test_mismatch_is_shrunk():
+    report = differential(_broken_engine, "python", matches=200, max_events=12)
+    assert not report.ok
+
+    mismatch = report.mismatches[0]
+    assert len(mismatch.events) < len(mismatch.original_events)
+    assert check(mismatch.events, _broken_engine, "python") is not None
+    assert [event["event"] for event in mismatch.events] == [4]
+    assert mismatch.events[0]["minutes"] == mismatch.events[0]["seconds"] == 0
+
+
+def test_shrink_removes_unrelated_events():
+    events = generate_events(3, num_events=10, shuffle=False)
+    target = events[4]
+    shrunk = shrink(events, lambda events: any(event["event"] == target["event"] for event in events))
+    assert len(shrunk) == 1
+    assert shrunk[0]["event"] == target["event"]
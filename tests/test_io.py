@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import DATASETS
+from conftest import DATASETS_PATH
+
+from floorball_penalty_timekeeping.io import MatchArchive
+from floorball_penalty_timekeeping.io import events_from_json
+from floorball_penalty_timekeeping.io import events_from_jsonl
+from floorball_penalty_timekeeping.io import index_path_for
+from floorball_penalty_timekeeping.io import iter_matches_json
+from floorball_penalty_timekeeping.io import iter_matches_jsonl
+from floorball_penalty_timekeeping.io import matches_from_json
+from floorball_penalty_timekeeping.io import write_match_archive
+from floorball_penalty_timekeeping.io import write_matches_jsonl
+from floorball_penalty_timekeeping.results import COLUMNS
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_matches_json(chunk_size):
+    assert dict(iter_matches_json(DATASETS_PATH, chunk_size=chunk_size)) == DATASETS
+
+
+def test_iter_matches_json_empty(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text(" { } ")
+    assert list(iter_matches_json(path)) == []
+
+
+def test_jsonl_roundtrip_and_index(tmp_path):
+    path = str(tmp_path / "season.jsonl")
+    write_matches_jsonl(DATASETS, path)
+    assert dict(iter_matches_jsonl(path)) == DATASETS
+
+    for name in ["test_example_6", "test_terminate_running_minor_penalty"]:
+        pd.testing.assert_frame_equal(events_from_jsonl(path, name), events_from_json(DATASETS_PATH, name))
+    assert os.path.exists(index_path_for(path))
+
+    # the index is rebuilt once the archive changes
+    write_matches_jsonl({"new": DATASETS["test_example_1"], **DATASETS}, path)
+    pd.testing.assert_frame_equal(events_from_jsonl(path, "new"), events_from_json(DATASETS_PATH, "test_example_1"))
+
+
+def test_match_archive_round_trip(tmp_path):
+    path = tmp_path / "season.fbpt"
+    write_match_archive(matches_from_json(DATASETS_PATH), path)
+
+    with MatchArchive(path) as archive:
+        assert archive.names == list(DATASETS)
+        for name, events in archive:
+            expected = events_from_json(DATASETS_PATH, name)
+            pd.testing.assert_frame_equal(events, expected)
+            pd.testing.assert_frame_equal(prepare_events(events), prepare_events(expected))
+
+            expected_tables = timekeeping(prepare_events(expected), as_tables=True)
+            tables = archive.penalty_tables(name)
+            assert list(tables) == list(expected_tables)
+            for team, table in tables.items():
+                for column in COLUMNS + ["personal"]:
+                    np.testing.assert_array_equal(getattr(table, column), getattr(expected_tables[team], column))
+
+
+def test_match_archive_is_memory_mapped(tmp_path):
+    path = tmp_path / "season.fbpt"
+    name = "test_example_6"
+    write_match_archive([(name, events_from_json(DATASETS_PATH, name))], path)
+
+    with MatchArchive(path) as archive:
+        arrays = archive.event_arrays(name)
+        np.testing.assert_array_equal(arrays["seconds"], [150, 180, 240])
+        np.testing.assert_array_equal(archive.players[arrays["player"]], [93, 75, 78])
+        assert not arrays["seconds"].flags.owndata
+        assert not arrays["seconds"].flags.writeable
+        assert not archive.penalty_tables(name)["A"].time_end.flags.owndata
+
+
+def test_match_archive_rejects_unknown_columns(tmp_path):
+    events = pd.DataFrame([{"team": "A", "player": 1, "event": 2, "minutes": 1, "seconds": 0, "period": 1}])
+    with pytest.raises(ValueError):
+        write_match_archive([("final", events)], tmp_path / "final.fbpt")
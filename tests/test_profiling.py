@@ -0,0 +1,52 @@
+import json
+
+import pandas as pd
+import pytest
+from conftest import DATASETS
+
+from floorball_penalty_timekeeping.profiling import TimekeepingProfiler
+from floorball_penalty_timekeeping.profiling import profile_timekeeping
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+
+@pytest.mark.parametrize("engine", ["python", "pandas"])
+def test_profiler_records_phases(engine):
+    events = prepare_events(pd.DataFrame(DATASETS["test_example_6"]))
+    profiler = TimekeepingProfiler()
+    result = timekeeping(events.copy(), engine=engine, profiler=profiler)
+
+    expected = timekeeping(events.copy(), engine=engine)
+    for team in expected:
+        pd.testing.assert_frame_equal(result[team], expected[team])
+
+    summary = profiler.summary()
+    # three events and two end of match events for both teams
+    assert summary["start_penalties"]["calls"] == 10
+    assert summary["personal_penalties"]["calls"] == 10
+    assert summary["add_penalty"]["calls"] == 2
+    assert summary["goal_termination"]["calls"] == 1
+
+    goal = [record for record in profiler.records if record["phase"] == "goal_termination"][0]
+    assert goal["team"] == "A"
+    assert goal["time"] == 240
+    assert goal["num_penalties"] == 1
+
+
+def test_profile_context_and_exports(tmp_path):
+    with profile_timekeeping() as profiler:
+        timekeeping(prepare_events(pd.DataFrame(DATASETS["test_break_running_personal_penalty"])))
+    num_records = len(profiler.records)
+    assert num_records > 0
+
+    # profiling is off outside of the context
+    timekeeping(prepare_events(pd.DataFrame(DATASETS["test_example_1"])))
+    assert len(profiler.records) == num_records
+
+    trace = json.loads(profiler.to_chrome_trace())
+    assert len(trace["traceEvents"]) == num_records
+    assert {event["ph"] for event in trace["traceEvents"]} == {"X"}
+
+    profiler.to_json(tmp_path / "profile.json")
+    with open(tmp_path / "profile.json") as f:
+        assert len(json.load(f)["records"]) == num_records
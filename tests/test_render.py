@@ -0,0 +1,115 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import DATASETS
+
+from floorball_penalty_timekeeping.render import CachedFigure
+from floorball_penalty_timekeeping.render import HtmlTable
+from floorball_penalty_timekeeping.render import assign_lanes
+from floorball_penalty_timekeeping.render import default_renderer
+from floorball_penalty_timekeeping.render import penalty_scene
+from floorball_penalty_timekeeping.render import scene_to_svg
+from floorball_penalty_timekeeping.render import time_ticks
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+from floorball_penalty_timekeeping.views import _prepare_goals
+from floorball_penalty_timekeeping.views import _prepare_penalty_times_for_plot
+from floorball_penalty_timekeeping.views import display_penalty_table
+
+
+def _scene(events):
+    ordered_events = prepare_events(pd.DataFrame(events))
+    penalties = timekeeping(ordered_events, as_tables=True)
+    teams = list(penalties)
+    goals = _prepare_goals(ordered_events.loc[ordered_events["event"] == 0].copy(), teams)
+    penalties_to_plot, plot_params = _prepare_penalty_times_for_plot(penalties, teams)
+    return penalty_scene(penalties_to_plot, goals, **plot_params)
+
+
+def test_svg():
+    scene = _scene(DATASETS["test_example_6"])
+    root = ET.fromstring(scene_to_svg(scene))
+
+    colors = [element.get("stroke") for element in root.iter("{http://www.w3.org/2000/svg}line")]
+    # per team a waiting, running and bench line and the ends of the first two
+    assert colors.count("red") == 7
+    assert colors.count("blue") == 7
+    assert len(list(root.iter("{http://www.w3.org/2000/svg}path"))) == 1
+    assert "02:00" in [element.text for element in root.iter("{http://www.w3.org/2000/svg}text")]
+
+
+def test_cached_figure_updates_changed_artists():
+    events = DATASETS["test_example_6"]
+    figure = CachedFigure()
+    fig = figure.draw(_scene(events))
+    assert "A:running" in figure.updated
+
+    assert figure.draw(_scene(events)) is fig
+    assert figure.updated == []
+
+    goal = {"Team": "A", "player": 7, "event": 0, "minutes": 4, "seconds": 30}
+    figure.draw(_scene(events + [goal]))
+    assert "goals" in figure.updated
+    assert not any(name.startswith("A:") for name in figure.updated)
+
+
+def test_time_ticks():
+    ticks = time_ticks(150.0, 300.0)
+    assert ticks.dtype.kind == "i"
+    np.testing.assert_array_equal(ticks, [120, 180, 240, 300])
+
+
+def test_default_renderer(monkeypatch):
+    monkeypatch.delenv("TIMEKEEPING_RENDERER", raising=False)
+    assert default_renderer() == "matplotlib"
+    monkeypatch.setenv("TIMEKEEPING_RENDERER", "svg")
+    assert default_renderer() == "svg"
+    monkeypatch.setenv("TIMEKEEPING_RENDERER", "ascii")
+    with pytest.raises(ValueError):
+        default_renderer()
+
+
+def test_assign_lanes_clusters():
+    # the third penalty goes to the bench after the second one ended
+    order, position = assign_lanes([1, 1, 1, -1], [0, 50, 80, 10], [100, 60, 90, np.nan])
+
+    np.testing.assert_array_equal(order, [3, 0, 1, 2])
+    np.testing.assert_array_equal(position, [-1, 0.75, 1.25, 1])
+
+
+def test_assign_lanes_colouring():
+    order, position = assign_lanes([1, 1, 1, 1], [0, 50, 80, 200], [100, 60, np.nan, 210], mode="colouring")
+
+    np.testing.assert_array_equal(order, [0, 1, 2, 3])
+    np.testing.assert_array_equal(position, [0.75, 1.25, 1.25, 0.75])
+
+
+def test_assign_lanes_unknown_mode():
+    with pytest.raises(ValueError):
+        assign_lanes([1], [0], [120], mode="random")
+
+
+def test_html_table_renders_changed_rows_only():
+    table = HtmlTable(["Player", "End"], row_style=lambda row: "color: red;" if row["Player"] == "7" else "")
+    html = table.render([("7", "02:00"), ("9", "")])
+    assert table.rendered == 2
+    assert '<tr style="color: red;"><td>7</td><td>02:00</td></tr>' in html
+    assert "<th>Player</th><th>End</th>" in html
+
+    html = table.render([("7", "02:00"), ("9", "04:00"), ("<b>", "")])
+    assert table.rendered == 2
+    assert "<td>04:00</td>" in html
+    assert "<td>&lt;b&gt;</td>" in html
+
+
+def test_display_penalty_table_with_open_penalties():
+    events = [{"team": "A", "player": "7", "event": 5, "minutes": 1, "seconds": 0}]
+    penalties = timekeeping(prepare_events(pd.DataFrame(events)), as_tables=True)
+    df = display_penalty_table(penalties["A"])
+    assert df.values.tolist() == [
+        ["Bgl. 7", "01:00", "01:00", "03:00"],
+        ["Bgl. 7", "01:00", "03:00", "05:00"],
+        ["7", "01:00", "", ""],
+    ]
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import DATASETS
+
+from floorball_penalty_timekeeping.results import MISSING
+from floorball_penalty_timekeeping.results import PenaltyTable
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+
+@pytest.mark.parametrize("engine", ["python", "pandas"])
+def test_tables_match_frames(engine):
+    events = prepare_events(pd.DataFrame(DATASETS["test_example_4"]))
+    frames = timekeeping(events.copy(), engine=engine)
+    tables = timekeeping(events.copy(), engine=engine, as_tables=True)
+
+    table = tables["A"]
+    assert table.time_end.dtype == np.int32
+    assert table.time_start.tolist() == [150, 270, 300, 420, MISSING]
+    assert table.is_missing("time_end").sum() == 1
+
+    for team, penalty_times in frames.items():
+        df = tables[team].to_pandas()
+        assert df["time_end"].sum() == penalty_times["time_end"].sum()
+        assert df["player"].tolist() == penalty_times["player"].tolist()
+
+
+def test_to_pandas_shares_memory():
+    table = PenaltyTable.from_records([(0, "10", 300, 300, 420), (1, "Bgl. 7", 310, None, None)])
+    df = table.to_pandas()
+
+    assert np.shares_memory(df["time_start"].array._data, table.time_start)
+    assert df["time_start"].isna().tolist() == [False, True]
+    pd.testing.assert_series_equal(
+        PenaltyTable.from_frame(df).to_pandas()["time_end"], df["time_end"]
+    )
@@ -0,0 +1,105 @@
+from dataclasses import replace
+
+import pandas as pd
+import pytest
+
+from floorball_penalty_timekeeping.fuzz import differential
+from floorball_penalty_timekeeping.results import penalty_rows
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.rules import EventRule
+from floorball_penalty_timekeeping.rules import RuleSet
+from floorball_penalty_timekeeping.session import TimekeepingSession
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+JUNIOR_RULES = RuleSet(
+    {
+        **DEFAULT_RULES.events,
+        2: replace(DEFAULT_RULES.events[2], bench_duration=90),
+        4: replace(DEFAULT_RULES.events[4], bench_duration=150, bench_penalties=3),
+        3: replace(DEFAULT_RULES.events[3], personal_duration=300),
+    },
+    max_running=3,
+    rink="KF",
+)
+
+
+def test_default_rules_compile_event_metadata():
+    rules = DEFAULT_RULES.compiled
+    assert list(DEFAULT_RULES.events) == [0, 1, 2, 4, 3, 5]
+    assert DEFAULT_RULES.display(4) == "major penalty (2'+2')"
+    assert rules.max_running == 2
+    assert rules.penalty_events == {2, 3, 4, 5}
+    assert rules.terminating_events == {0}
+    assert rules.bench_penalties == (0, 0, 1, 1, 2, 2)
+    assert set(rules.bench_durations) == {120}
+    assert [rules.personal_duration(event) for event in range(-1, 7)] == [None, None, None, None, 600, None, None, None]
+    assert DEFAULT_RULES.num_players == 6
+
+
+def test_rules_are_validated():
+    with pytest.raises(ValueError):
+        RuleSet({-1: EventRule("goal")})
+    with pytest.raises(ValueError):
+        RuleSet({3: EventRule("personal", personal=True)})
+    with pytest.raises(ValueError):
+        RuleSet(DEFAULT_RULES.events, max_running=0)
+
+
+def test_custom_rules_change_penalty_times():
+    events = [
+        {"team": "A", "player": "4", "event": 2, "minutes": 1, "seconds": 0},
+        {"team": "B", "player": "7", "event": 4, "minutes": 1, "seconds": 0},
+    ]
+    ordered_events = prepare_events(pd.DataFrame(events))
+    penalty_times_by_team = timekeeping(ordered_events.copy(), rules=JUNIOR_RULES)
+    assert penalty_times_by_team["A"]["time_end"].tolist() == [150]
+    assert penalty_times_by_team["B"]["time_end"].tolist() == [210, 360, 510]
+
+    session = TimekeepingSession(events, rules=JUNIOR_RULES)
+    for team, penalty_times in session.penalty_times_by_team().items():
+        pd.testing.assert_frame_equal(penalty_times, penalty_times_by_team[team], check_index_type="equiv")
+
+
+def test_session_replays_custom_personal_penalties():
+    rules = RuleSet({
+        **DEFAULT_RULES.events,
+        6: EventRule("personal penalty (5')", bench_penalties=1, personal=True, personal_duration=300),
+    })
+    events = [
+        {"team": "A", "player": "P", "event": 6, "minutes": 10, "seconds": 0},
+        {"team": "B", "player": "P", "event": 6, "minutes": 0, "seconds": 0},
+        {"team": "B", "player": "Q", "event": 0, "minutes": 9, "seconds": 0},
+        {"team": "A", "player": "P", "event": 6, "minutes": 2, "seconds": 0},
+        {"team": "B", "player": "Q", "event": 0, "minutes": 10, "seconds": 0},
+    ]
+    # events are appended out of chronological order, which changes the
+    # event codes that earlier personal penalties look up
+    session = TimekeepingSession(events, rules=rules)
+    expected = timekeeping(prepare_events(pd.DataFrame(events)), as_tables=True, rules=rules)
+    assert penalty_rows(session.penalty_tables()) == penalty_rows(expected)
+
+
+def test_engines_agree_under_custom_rules():
+    report = differential("python", "pandas", matches=20, rules=JUNIOR_RULES)
+    assert report.ok
+
+
+@pytest.mark.parametrize("engine", ["python", "pandas"])
+@pytest.mark.parametrize("max_running, times, starts", [
+    # the second minor waits for the only slot
+    (1, [0, 10], [0, 120]),
+    # the first freed slot starts the waiting penalty, not the latest one
+    (2, [0, 10, 20], [0, 10, 120]),
+    # staggered minors take the slots in the order they are freed
+    (3, [0, 30, 30, 40, 40], [0, 30, 30, 120, 150]),
+])
+def test_waiting_penalties_start_when_a_slot_is_freed(engine, max_running, times, starts):
+    rules = replace(DEFAULT_RULES, max_running=max_running)
+    events = [
+        {"team": "A", "player": str(player), "event": 2, "minutes": 0, "seconds": seconds}
+        for player, seconds in enumerate(times)
+    ]
+    penalty_times = timekeeping(prepare_events(pd.DataFrame(events)), engine=engine, rules=rules)["A"]
+    assert penalty_times["time_start"].tolist() == starts
+    assert penalty_times["time_end"].tolist() == [start + 120 for start in starts]
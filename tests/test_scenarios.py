@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from floorball_penalty_timekeeping.fuzz import generate_events
+from floorball_penalty_timekeeping.scenarios import Add
+from floorball_penalty_timekeeping.scenarios import Change
+from floorball_penalty_timekeeping.scenarios import Drop
+from floorball_penalty_timekeeping.scenarios import ScenarioEvaluator
+from floorball_penalty_timekeeping.scenarios import Shift
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+EVENTS = [
+    {"team": "A", "player": "10", "event": 2, "minutes": 5, "seconds": 0},
+    {"team": "B", "player": "5", "event": 0, "minutes": 5, "seconds": 30},
+]
+
+
+def test_evaluate_lists_changed_end_times():
+    table = ScenarioEvaluator(EVENTS).evaluate({
+        "late goal": Shift(1, 120),
+        "major": Change(0, {"event": 4}),
+        "other scorer": Change(1, {"player": "7"}),
+        "added": Add({"team": "A", "player": "9", "event": 2, "minutes": 5, "seconds": 10}),
+    })
+
+    assert table["scenario"].tolist() == ["late goal", "major", "added"]
+    assert table.loc[0, ["event_id", "player", "base_end", "time_end", "difference"]].tolist() == [0, "10", 330, 420, 90]
+    # the goal ends the first half of the major penalty, the second one is new
+    assert table.loc[1, "base_end"] is pd.NA
+    assert table.loc[1, "time_end"] == 450
+    assert table.loc[2, "event_id"] is pd.NA
+    assert table.loc[2, "time_end"] == 430
+
+
+def test_perturbations_refer_to_base_events():
+    evaluator = ScenarioEvaluator(EVENTS)
+    with pytest.raises(IndexError):
+        evaluator.variant([Drop(1), Shift(1, 10)])
+    with pytest.raises(ValueError):
+        evaluator.variant(Shift(0, -301))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_variants_match_full_replay(seed):
+    events = generate_events(seed, num_events=12, shuffle=False)
+    evaluator = ScenarioEvaluator(events)
+    scenarios = [
+        Shift(len(events) - 1, -30),
+        Change(len(events) // 2, {"event": 4}),
+        Drop(0),
+        [Shift(1, 60), Add({"team": "B", "player": "3", "event": 2, "minutes": 30, "seconds": 0})],
+    ]
+    for perturbations in scenarios:
+        if isinstance(perturbations, Shift) and events[perturbations.position]["minutes"] == 0:
+            continue
+        variant = evaluator.variant(perturbations)
+        if not variant.session.events:
+            continue
+        assert variant.replayed <= len(variant.session)
+
+        expected = timekeeping(prepare_events(pd.DataFrame(variant.session.events)))
+        result = variant.session.penalty_times_by_team()
+        for team in expected:
+            pd.testing.assert_frame_equal(result[team], expected[team], check_index_type="equiv")
+
+    # the base match is not touched by its variants
+    expected = timekeeping(prepare_events(pd.DataFrame(events)))
+    for team in expected:
+        pd.testing.assert_frame_equal(evaluator.base.penalty_times_by_team()[team], expected[team], check_index_type="equiv")
+
+
+def test_late_change_replays_only_the_suffix():
+    events = generate_events(3, num_events=12, shuffle=False)
+    evaluator = ScenarioEvaluator(events)
+    last = max(range(len(events)), key=lambda position: (events[position]["minutes"], events[position]["seconds"]))
+    assert evaluator.variant(Change(last, {"player": "99"})).replayed <= 2
@@ -0,0 +1,182 @@
+import asyncio
+import json
+
+import pytest
+from conftest import make_event
+
+from floorball_penalty_timekeeping.server import HTTPError
+from floorball_penalty_timekeeping.server import MatchHub
+from floorball_penalty_timekeeping.server import TimekeepingServer
+from floorball_penalty_timekeeping.server import diff_rows
+
+
+async def _request(port, method, path, data=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if data is None else json.dumps(data).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+async def _next_event(reader):
+    lines = []
+    while (line := (await reader.readline()).decode()) != "\n":
+        lines.append(line.strip())
+    fields = dict(line.split(": ", 1) for line in lines)
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_diff_rows():
+    old = {"A": {"1:0": {"time_end": None}, "2:0": {"time_end": 300}}}
+    new = {"A": {"1:0": {"time_end": 240}, "2:0": {"time_end": 300}}, "B": {"3:0": {"time_end": None}}}
+
+    assert diff_rows(old, new) == {
+        "changed": {"A": {"1:0": {"time_end": 240}}, "B": {"3:0": {"time_end": None}}},
+        "removed": {},
+    }
+    assert diff_rows(new, old)["removed"] == {"B": ["3:0"]}
+
+
+def test_hub_publishes_changed_rows():
+    hub = MatchHub()
+    hub.append("court 1", make_event("A", 12, 2, 1, 0))
+    changes = hub.append("court 1", make_event("B", 7, 0, 2, 0))
+
+    # the goal terminates the minor penalty of team A
+    assert changes["changed"]["A"]["0:0"]["time_end"] == 120
+    assert "B" not in changes["changed"]
+
+
+def test_hub_rejects_inconsistent_events():
+    hub = MatchHub()
+    hub.append("court 1", make_event("A", 12, 5, 1, 0))
+    with pytest.raises(HTTPError) as error:
+        hub.append("court 1", make_event("A", 12, 2, 3, 0))
+    assert error.value.status == 400
+    assert "match penalty at 01:00" in str(error.value)
+    assert len(hub.sessions["court 1"]) == 1
+
+
+@pytest.mark.parametrize("field, value", [
+    ("event", 2.0),
+    ("event", [2]),
+    ("event", True),
+    ("team", ["A"]),
+    ("player", None),
+    ("minutes", 10 ** 20),
+    ("minutes", -1),
+    ("seconds", 60),
+])
+def test_hub_rejects_malformed_events(field, value):
+    hub = MatchHub()
+    with pytest.raises(HTTPError) as error:
+        hub.append("court 1", {**make_event("A", 12, 2, 1, 0), field: value})
+    assert error.value.status == 400
+    assert "court 1" not in hub.sessions
+
+
+def test_hub_drops_unknown_fields():
+    hub = MatchHub()
+    hub.append("court 1", {**make_event("A", 12, 2, 1, 0), "Comment": "late"})
+    assert hub.sessions["court 1"].events == [make_event("A", 12, 2, 1, 0)]
+
+
+def test_hub_accepts_overtime():
+    hub = MatchHub()
+    hub.append("court 1", make_event("A", 12, 2, 59, 0))
+    changes = hub.append("court 1", make_event("B", 7, 0, 60, 30))
+    assert changes["changed"]["A"]["0:0"]["time_end"] == 60 * 60 + 30
+
+
+def test_hub_recovers_logged_matches(tmp_path):
+    hub = MatchHub(tmp_path)
+    hub.append("court 1", [make_event("A", 12, 2, 1, 0), make_event("B", 7, 0, 2, 0)])
+    hub.append("court 2", make_event("B", 4, 4, 5, 0))
+    hub.pop_last("court 1")
+    for session in hub.sessions.values():
+        session.close()
+
+    recovered = MatchHub(tmp_path)
+    assert list(recovered.sessions) == ["court 1", "court 2"]
+    for name in hub.sessions:
+        assert recovered.snapshot(name) == hub.snapshot(name)
+
+
+def test_server():
+    async def scenario():
+        server = TimekeepingServer()
+        await server.start(port=0)
+        port = server.port
+
+        status, changes = await _request(port, "POST", "/matches/court%201/events", make_event("A", 12, 2, 1, 0))
+        assert status == 200
+        assert changes["changed"]["A"]["0:0"] == {
+            "event_id": 0, "player": 12, "to_bench": 60, "time_start": 60, "time_end": 180,
+        }
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /matches/court%201/stream HTTP/1.1\r\n\r\n")
+        await writer.drain()
+        while await reader.readline() != b"\r\n":
+            pass
+        event, snapshot = await _next_event(reader)
+        assert event == "snapshot"
+        assert snapshot["events"] == 1
+
+        await _request(port, "POST", "/matches/court%201/events", make_event("B", 7, 0, 2, 0))
+        event, changes = await _next_event(reader)
+        assert event == "changes"
+        assert changes["changed"] == {"A": {"0:0": {
+            "event_id": 0, "player": 12, "to_bench": 60, "time_start": 60, "time_end": 120,
+        }}}
+
+        status, changes = await _request(port, "DELETE", "/matches/court%201/events/last")
+        assert status == 200
+        event, pushed = await _next_event(reader)
+        assert pushed == changes
+        assert changes["changed"]["A"]["0:0"]["time_end"] == 180
+
+        assert await _request(port, "GET", "/matches") == (200, {"matches": ["court 1"]})
+        assert (await _request(port, "GET", "/matches/court%202"))[0] == 404
+        assert (await _request(port, "POST", "/matches/court%201/events", {"team": "A"}))[0] == 400
+
+        writer.close()
+        server.server.close()
+        await server.server.wait_closed()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_server_rejects_malformed_content_length(length):
+    async def scenario():
+        server = TimekeepingServer()
+        await server.start(port=0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(f"POST /matches/court%201/events HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+        await writer.drain()
+        head, _, body = (await reader.read()).partition(b"\r\n\r\n")
+        writer.close()
+        server.server.close()
+        await server.server.wait_closed()
+        return int(head.split()[1]), json.loads(body)
+
+    status, body = asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    assert status == 400
+    assert body == {"error": "Malformed Content-Length."}
+
+
+def test_server_answers_unexpected_errors():
+    async def scenario():
+        server = TimekeepingServer()
+        server.hub.snapshot = lambda name: 1 / 0
+        await server.start(port=0)
+        response = await _request(server.port, "GET", "/matches/court%201")
+        server.server.close()
+        await server.server.wait_closed()
+        return response
+
+    assert asyncio.run(asyncio.wait_for(scenario(), timeout=10)) == (500, {"error": "Internal server error."})
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+from conftest import DATASETS
+
+from floorball_penalty_timekeeping.session import TimekeepingSession
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.utils import prepare_events
+
+
+def assert_matches_replay(session):
+    expected = timekeeping(prepare_events(pd.DataFrame(session.events)))
+    result = session.penalty_times_by_team()
+
+    assert list(result) == list(expected)
+    for team in expected:
+        pd.testing.assert_frame_equal(result[team], expected[team], check_index_type="equiv")
+
+
+@pytest.mark.parametrize("name", list(DATASETS))
+def test_append_matches_replay(name):
+    session = TimekeepingSession()
+    for event in DATASETS[name]:
+        session.append(event)
+        assert_matches_replay(session)
+
+
+@pytest.mark.parametrize("name", list(DATASETS))
+def test_pop_last_restores_previous_state(name):
+    session = TimekeepingSession(DATASETS[name])
+    while len(session) > 1:
+        session.pop_last()
+        assert_matches_replay(session)
+
+
+def test_append_out_of_order():
+    events = DATASETS["test_example_1"]
+    session = TimekeepingSession(events[::-1])
+    assert_matches_replay(session)
+
+    session.append({"team": "A", "player": "7", "event": 2, "minutes": 1, "seconds": 0})
+    assert_matches_replay(session)
+
+
+def test_pauses_match_replay():
+    session = TimekeepingSession(DATASETS["test_break_running_personal_penalty"])
+    _, expected = timekeeping(prepare_events(pd.DataFrame(session.events)), return_pauses=True)
+    for team, pauses in session.pauses_by_team().items():
+        pd.testing.assert_frame_equal(pauses, expected[team])
+
+
+@pytest.mark.parametrize("name", list(DATASETS))
+def test_edit_insert_delete_match_replay(name):
+    for position in range(len(DATASETS[name])):
+        session = TimekeepingSession(DATASETS[name])
+        events = session.events
+        session.edit(position, seconds=(events[position]["seconds"] + 7) % 60)
+        assert_matches_replay(session)
+
+        session.edit(position, event=2 if events[position]["event"] != 2 else 3)
+        assert_matches_replay(session)
+
+        session.insert({"team": events[position]["team"], "player": "99", "event": 2, "minutes": 0, "seconds": 30}, position)
+        assert_matches_replay(session)
+
+        session.delete(position + 1)
+        assert_matches_replay(session)
+
+
+def test_late_edit_replays_suffix_only():
+    session = TimekeepingSession(DATASETS["test_example_1"])
+    events = session.events
+    last = max(range(len(events)), key=lambda i: (events[i]["minutes"], events[i]["seconds"], events[i]["event"]))
+
+    report = session.edit(last, minutes=events[last]["minutes"] + 1)
+    assert report["replayed"] == 1
+    assert_matches_replay(session)
+
+
+def test_edit_reports_changed_and_removed_rows():
+    session = TimekeepingSession([
+        {"team": "A", "player": "7", "event": 2, "minutes": 1, "seconds": 0},
+        {"team": "B", "player": "9", "event": 2, "minutes": 2, "seconds": 0},
+    ])
+    report = session.edit(1, minutes=5)
+    assert [row["time_start"] for row in report["changed"]["B"].values()] == [300]
+    assert list(report["changed"]) == ["B"]
+    assert report["removed"] == {}
+
+    report = session.delete(1)
+    assert report["changed"] == {}
+    assert report["removed"] == {"B": ["1:0"]}
+    assert report["replayed"] == 0
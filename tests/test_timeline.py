@@ -0,0 +1,133 @@
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import DATASETS
+
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.timekeeping import timekeeping
+from floorball_penalty_timekeeping.timeline import PenaltyTimeline
+from floorball_penalty_timekeeping.timeline import court_strength
+from floorball_penalty_timekeeping.timeline import save_court_strength
+from floorball_penalty_timekeeping.utils import prepare_events
+
+
+def _timeline(name):
+    return PenaltyTimeline.from_events(prepare_events(pd.DataFrame(DATASETS[name])))
+
+
+def test_situation():
+    # personal penalty of 93 from 2:30, second replacement penalty from 6:00 to 8:00
+    timeline = _timeline("test_break_running_personal_penalty")
+    situation = timeline.situation(400)
+
+    assert situation["status"].tolist() == ["running", "paused"]
+    assert situation["player"].tolist() == ["Bgl. 93", 93]
+    assert situation["remaining"].tolist() == [80, 510]
+    assert timeline.situation(100).empty
+
+
+def test_state_at():
+    timeline = _timeline("test_break_running_personal_penalty")
+    state = timeline.state_at([0, 150, 269, 270, 360, 479, 480, 989, 990])["A"]
+
+    np.testing.assert_array_equal(state["penalty_running"], [0, 1, 1, 0, 1, 1, 0, 0, 0])
+    np.testing.assert_array_equal(state["personal_waiting"], [0, 1, 1, 0, 0, 0, 0, 0, 0])
+    np.testing.assert_array_equal(state["personal_running"], [0, 0, 0, 1, 0, 0, 1, 1, 0])
+    np.testing.assert_array_equal(state["personal_paused"], [0, 0, 0, 0, 1, 1, 0, 0, 0])
+    np.testing.assert_array_equal(state["on_court"], [6, 5, 5, 6, 5, 5, 6, 6, 6])
+    assert timeline.on_court(400) == {"A": 5, "EasterEgg": 6}
+
+
+def test_open_penalties():
+    # the match penalty of 93 never starts
+    timeline = _timeline("test_example_4")
+    situation = timeline.situation(5000)
+
+    assert situation["event_id"].tolist() == [1000]
+    assert situation["status"].tolist() == ["waiting"]
+    assert np.isnan(situation["remaining"].iloc[0])
+
+
+def test_between():
+    timeline = _timeline("test_break_running_personal_penalty")
+    intervals = timeline.between(300, 400)
+
+    assert intervals["status"].tolist() == ["running", "running", "paused"]
+    assert intervals["begin"].tolist() == [360, 270, 360]
+
+
+def test_without_penalties():
+    events = [{"team": "A", "player": 10, "event": 0, "minutes": 1, "seconds": 0}]
+    timeline = PenaltyTimeline.from_events(prepare_events(pd.DataFrame(events)))
+
+    assert timeline.situation(100).empty
+    np.testing.assert_array_equal(timeline.state_at([0, 100])["A"]["on_court"], [6, 6])
+
+
+def test_court_strength():
+    events = [
+        {"team": "A", "player": 12, "event": 2, "minutes": 1, "seconds": 0},
+        {"team": "A", "player": 3, "event": 2, "minutes": 1, "seconds": 30},
+        {"team": "A", "player": 4, "event": 2, "minutes": 2, "seconds": 0},
+        {"team": "B", "player": 7, "event": 0, "minutes": 2, "seconds": 10},
+    ]
+    ordered_events = prepare_events(pd.DataFrame(events))
+    tables = timekeeping(ordered_events, as_tables=True)
+
+    strength = court_strength(tables)
+    assert len(strength["A"]) == 3600
+    # the goal ends the first penalty and the third one starts
+    assert strength["A"][[59, 60, 89, 90, 129, 130, 209, 210, 249, 250]].tolist() == [6, 5, 5, 4, 4, 4, 4, 5, 5, 6]
+    assert (strength["B"] == 6).all()
+
+    assert court_strength(tables, replace(DEFAULT_RULES, rink="KF"), duration=300)["A"][[0, 60, 90]].tolist() == [4, 3, 3]
+
+
+@pytest.mark.parametrize("name", list(DATASETS))
+def test_court_strength_matches_timeline(name):
+    ordered_events = prepare_events(pd.DataFrame(DATASETS[name]))
+    timeline = PenaltyTimeline.from_events(ordered_events)
+    strength = court_strength(timeline.tables)
+
+    state = timeline.state_at(np.arange(len(strength["A"])))
+    for team in timeline.teams:
+        np.testing.assert_array_equal(strength[team], state[team]["on_court"])
+
+
+@pytest.mark.parametrize("suffix", [".npz", ".parquet"])
+def test_save_court_strength(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    strength = {"A": np.full(3600, 6, dtype=np.int8), "B": np.full(3600, 5, dtype=np.int8)}
+    path = tmp_path / f"strength{suffix}"
+    save_court_strength(strength, path)
+
+    if suffix == ".npz":
+        loaded = dict(np.load(path))
+    else:
+        df = pd.read_parquet(path)
+        assert df["second"].tolist() == list(range(3600))
+        loaded = {team: df[team].to_numpy() for team in strength}
+    for team, on_court in strength.items():
+        np.testing.assert_array_equal(loaded[team], on_court)
+
+
+@pytest.mark.parametrize("engine", ["python", "pandas"])
+def test_penalties_of_late_events_are_no_personal_penalties(engine):
+    # events of a season slice keep their index, far above the offset of personal penalties
+    events = pd.DataFrame(
+        [{"team": "A", "player": 10, "event": 2, "minutes": 1, "seconds": 0}], index=[1500]
+    )
+    timeline = PenaltyTimeline.from_events(prepare_events(events), engine=engine)
+
+    assert timeline.situation(90)["kind"].tolist() == ["penalty"]
+    assert timeline.on_court(90)["A"] == 5
+    assert court_strength(timeline.tables, duration=200)["A"][90] == 5
+
+
+def test_timeline_follows_rink_of_rules():
+    events = [{"team": "A", "player": 10, "event": 2, "minutes": 1, "seconds": 0}]
+    timeline = PenaltyTimeline.from_events(prepare_events(pd.DataFrame(events)), rules=replace(DEFAULT_RULES, rink="KF"))
+    assert timeline.on_court(90) == {"A": 3, "EasterEgg": 4}
@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+from conftest import DATASETS
+from conftest import make_event
+
+from floorball_penalty_timekeeping.fuzz import generate_events
+from floorball_penalty_timekeeping.rules import DEFAULT_RULES
+from floorball_penalty_timekeeping.rules import RuleSet
+from floorball_penalty_timekeeping.utils import Event
+from floorball_penalty_timekeeping.utils import prepare_events
+from floorball_penalty_timekeeping.validation import ERROR
+from floorball_penalty_timekeeping.validation import WARNING
+from floorball_penalty_timekeeping.validation import errors
+from floorball_penalty_timekeeping.validation import validate_event_arrays
+from floorball_penalty_timekeeping.validation import validate_events
+
+
+@pytest.mark.parametrize("name", list(DATASETS))
+def test_datasets_are_consistent(name):
+    assert validate_events(DATASETS[name]) == []
+
+
+def test_generated_matches_have_no_errors():
+    for seed in range(100):
+        assert errors(validate_events(generate_events(seed))) == []
+
+
+def test_player_after_match_penalty():
+    events = [
+        make_event("A", "4", 0, 20, 0),
+        make_event("A", "4", 5, 10, 0),
+        make_event("A", "4", 2, 10, 0),
+        make_event("B", "9", 0, 12, 0),
+    ]
+    diagnostics = validate_events(events)
+    # the minor penalty at the time of the match penalty is fine, the later goal is not
+    assert [(diagnostic.position, diagnostic.field, diagnostic.severity) for diagnostic in diagnostics] == [(0, "player", ERROR)]
+    assert diagnostics[0].message == "Player 4 of team A got a match penalty at 10:00."
+
+
+def test_times_teams_and_codes():
+    diagnostics = validate_events([
+        make_event("A", "4", 2, 61, 0),
+        make_event("B", "5", 2, 3, 75),
+        make_event("C", "6", 0, 4, 30),
+        make_event("A", "7", 9, 5, 0),
+        make_event("A", "8", 2, 0, 30),
+    ])
+    assert [(diagnostic.position, diagnostic.field, diagnostic.severity) for diagnostic in diagnostics] == [
+        (1, "seconds", ERROR), (2, "team", ERROR), (3, "event", ERROR), (0, "minutes", WARNING),
+    ]
+    assert diagnostics[0].message == "Seconds must be between 0 and 59, got 75."
+    assert diagnostics[3].message == "The event at 61:00 happens after the end of the match at 60:00."
+
+    overtime = RuleSet(DEFAULT_RULES.events, match_duration=70 * 60)
+    assert [diagnostic.field for diagnostic in validate_events([make_event("A", "4", 2, 61, 0)], overtime)] == []
+
+
+def test_warnings():
+    diagnostics = validate_events([
+        make_event("A", "4", 2, 5, 0),
+        make_event("A", "4", 2, 5, 0),
+        make_event("A", "8", 0, 6, 0),
+        make_event("B", "3", 0, 6, 0),
+        make_event("B", "2", 3, 7, 0),
+        make_event("B", "2", 3, 9, 0),
+    ])
+    assert [(diagnostic.position, diagnostic.severity) for diagnostic in diagnostics] == [
+        (1, WARNING), (3, WARNING), (5, WARNING),
+    ]
+    assert diagnostics[2].message == (
+        "Player 2 of team B already got a personal penalty at 07:00, the second one is a match penalty."
+    )
+
+
+def test_validate_prepared_events():
+    events = [make_event("A", "4", 5, 10, 0), make_event("A", "4", 2, 12, 0)]
+    diagnostics = validate_event_arrays(prepare_events(pd.DataFrame(events)))
+    assert [diagnostic.position for diagnostic in errors(diagnostics)] == [1]
+
+
+def test_event_form_validation():
+    assert Event("A", "4", 2, 3, 0).validate() == {}
+    assert set(Event("", "4", 2, -1, 60).validate()) == {"team", "minutes", "seconds"}
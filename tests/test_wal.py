@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+
+from conftest import DATASETS
+
+from floorball_penalty_timekeeping.results import penalty_rows
+from floorball_penalty_timekeeping.session import TimekeepingSession
+from floorball_penalty_timekeeping.wal import DurableSession
+from floorball_penalty_timekeeping.wal import EventLog
+
+
+def assert_same_penalties(session, events):
+    assert session.events == TimekeepingSession(events).events
+    assert penalty_rows(session.penalty_tables()) == penalty_rows(TimekeepingSession(events).penalty_tables())
+
+
+def test_recover_from_log(tmp_path):
+    events = DATASETS["test_example_1"]
+    session = DurableSession(tmp_path, "final")
+    for event in events:
+        session.append(event)
+    session.edit(1, minutes=7)
+    session.delete(0)
+    session.insert(events[0], 2)
+    session.pop_last()
+    session.close()
+
+    recovered = DurableSession(tmp_path, "final")
+    assert_same_penalties(recovered, session.events)
+    assert recovered.log.sequence == len(events) + 4
+
+
+def test_replaced_events_are_logged(tmp_path):
+    session = DurableSession(tmp_path, "final")
+    for event in DATASETS["test_example_1"]:
+        session.append(event)
+    session.replace_events(DATASETS["test_example_2"])
+    session.close()
+
+    recovered = DurableSession(tmp_path, "final")
+    assert_same_penalties(recovered, DATASETS["test_example_2"])
+
+
+def test_snapshot_replays_tail_only(tmp_path):
+    events = DATASETS["test_example_2"]
+    session = DurableSession(tmp_path, "final", snapshot_every=3)
+    for event in events:
+        session.append(event)
+    session.close()
+
+    with open(session.log.log_path) as f:
+        tail = [json.loads(line) for line in f]
+    assert len(tail) == len(events) % 3
+    assert [change["sequence"] for change in tail] == list(range(len(events) - len(tail) + 1, len(events) + 1))
+
+    recovered = DurableSession(tmp_path, "final")
+    assert_same_penalties(recovered, events)
+
+    # changes before the end of the snapshot replay the whole match
+    recovered.edit(0, seconds=5)
+    assert_same_penalties(recovered, recovered.events)
+
+
+def test_torn_and_stale_lines_are_skipped(tmp_path):
+    events = DATASETS["test_example_3"]
+    session = DurableSession(tmp_path, "final")
+    for event in events:
+        session.append(event)
+    session.close()
+    with open(session.log.log_path, "rb") as f:
+        lines = f.readlines()
+
+    # a crash after the snapshot but before the log was truncated
+    session = DurableSession(tmp_path, "final")
+    session.snapshot()
+    session.close()
+    with open(session.log.log_path, "wb") as f:
+        f.writelines(lines)
+        f.write(b'{"sequence": 99, "operation": "app')
+
+    recovered = DurableSession(tmp_path, "final")
+    assert_same_penalties(recovered, events)
+    assert os.path.getsize(session.log.log_path) == sum(len(line) for line in lines)
+
+    recovered.pop_last()
+    recovered.close()
+    assert_same_penalties(DurableSession(tmp_path, "final"), events[:-1])
+
+
+def test_names(tmp_path):
+    assert EventLog.names(tmp_path / "missing") == []
+    for name in ["A vs B", "U21/final"]:
+        DurableSession(tmp_path, name).append({"team": "A", "player": "7", "event": 2, "minutes": 1, "seconds": 0})
+    assert EventLog.names(tmp_path) == ["A vs B", "U21/final"]
+
+
+def test_concurrent_appends_are_serialized(tmp_path):
+    session = DurableSession(tmp_path, "final", snapshot_every=7)
+
+    def append_events(team):
+        for minute in range(20):
+            session.append({"team": team, "player": "4", "event": 0, "minutes": minute, "seconds": 0})
+
+    threads = [threading.Thread(target=append_events, args=(team,)) for team in ["A", "B", "A", "B"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    session.close()
+
+    assert len(session) == 80
+    recovered = DurableSession(tmp_path, "final")
+    assert recovered.log.sequence == 80
+    assert_same_penalties(recovered, session.events)